@@ -0,0 +1,116 @@
+# =========================================================
+# 候補の一括集計
+#  - 1回の実行で集めた (ID, Candidate) を並べて保持
+#  - (ID, size, site) ごとの最安値を 1回のソートでまとめて計算
+#  - 既存サイズとの突き合わせは ID インデックスで線形に処理
+# =========================================================
+
+from itertools import groupby
+
+from models import Candidate
+
+
+def size_sort_key(size):
+
+    try:
+        return (0, float(size), "")
+    except (TypeError, ValueError):
+        return (1, 0.0, str(size))
+
+
+class CandidateFrame:
+
+    def __init__(self):
+
+        self.ids = []
+        self.candidates = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, pid, candidate: Candidate):
+
+        self.ids.append(str(pid))
+        self.candidates.append(candidate)
+
+    def extend(self, pid, candidates):
+
+        for c in candidates:
+            self.add(pid, c)
+
+    # ===============================
+    # グループごとの最安値
+    # ===============================
+    def cheapest(self) -> dict:
+
+        ids, cs = self.ids, self.candidates
+
+        # 同値は先に追加された方を残す（安定ソート）
+        order = sorted(
+            range(len(ids)),
+            key=lambda i: (ids[i], cs[i].size, cs[i].site, cs[i].price)
+        )
+
+        out = {}
+
+        for key, group in groupby(
+            order,
+            key=lambda i: (ids[i], cs[i].size, cs[i].site)
+        ):
+
+            out[key] = cs[next(group)]
+
+        return out
+
+
+# ===============================
+# (ID, site) -> sizes インデックス
+# ===============================
+def index_sizes(keys) -> dict:
+
+    index = {}
+
+    for pid, size, site in keys:
+
+        index.setdefault((pid, site), set()).add(size)
+
+    return index
+
+
+# ===============================
+# 出力テーブル
+#  - 取得できたサイズ: 最安値の Candidate
+#  - 既存にあって今回取れなかったサイズ: None（price=0 扱い）
+#  - existing_sizes: (ID, site) -> 既存サイズ集合 を返す関数
+# ===============================
+def build_output(cheapest: dict, existing_sizes, target_ids, site) -> list:
+
+    fetched = index_sizes(cheapest.keys())
+
+    out = []
+
+    seen = set()
+
+    for pid in target_ids:
+
+        pid = str(pid)
+
+        if pid in seen:
+            continue
+
+        seen.add(pid)
+
+        sizes = (
+            existing_sizes(pid, site)
+            | fetched.get((pid, site), set())
+        )
+
+        for size in sorted(sizes, key=size_sort_key):
+
+            out.append((
+                pid,
+                size,
+                cheapest.get((pid, size, site))
+            ))
+
+    return out
@@ -0,0 +1,44 @@
+# =========================================================
+# API（ブラウザなし）の有効 / 無効
+#  - 環境変数が "0" なら最初から無効
+#  - 連続で MAX_API_FAILURES 回失敗したら無効化（以降は呼び出し側がブラウザに戻す）
+#  - 1回でも成功すれば失敗回数は 0 に戻る
+# =========================================================
+
+import os
+
+
+# 連続でこの回数失敗したら API を諦めてブラウザに戻す
+MAX_API_FAILURES = int(os.environ.get("MAX_API_FAILURES", 3))
+
+
+class ApiSwitch:
+
+    def __init__(self, name: str, env: str, fallback: str, max_failures: int = MAX_API_FAILURES):
+
+        self.name = name
+        self.fallback = fallback
+        self.max_failures = max_failures
+
+        self.enabled = os.environ.get(env, "1") != "0"
+        self.failures = 0
+
+    def ok(self):
+
+        self.failures = 0
+
+    def failed(self):
+
+        self.failures += 1
+
+        if self.enabled and self.failures >= self.max_failures:
+
+            print(f"[WARN] {self.name} keeps failing, fallback to {self.fallback}")
+
+            self.enabled = False
+
+    def disable(self, reason):
+
+        print(f"[WARN] {self.name} disabled: {reason}")
+
+        self.enabled = False
@@ -0,0 +1,269 @@
+# =========================================================
+# ブラウザ起動プロファイルの比較ベンチマーク
+#  - 記録したページ（HAR）を route_from_har で再生し、回線の揺れを除いて比較
+#  - プロファイルごとに 起動時間 / ページ表示（load まで）の中央値・p95 /
+#    ブラウザ側のピーク RSS / 成功率（サイトのパーサーでサイズや商品名が取れたか）
+#  - 成功率が最も高いプロファイルの中でメモリが一番少ないものを推奨
+#  - 記録は --record（chromium で開いて recorded/{site}.har.zip と .urls を保存）
+#
+#  python bench_browser_profiles.py --site mercari --record https://jp.mercari.com/item/m123 ...
+#  python bench_browser_profiles.py --site mercari [--profiles chromium,firefox] [--repeat 3]
+# =========================================================
+
+import os
+import time
+import asyncio
+import argparse
+import statistics
+
+from playwright.async_api import async_playwright
+
+from browser_profiles import PROFILES, DEFAULT_PROFILE
+from browser_watchdog import sample_rss
+from mercari_common import size_from_item_html
+from yahoo_common import sizes_from_html
+from main_snkrdunk_product import parse_product_html
+
+
+RECORDED_DIR = "recorded"
+
+# 取得できたら成功（scraper と同じパーサー）
+CHECKS = {
+    "mercari": lambda html: bool(size_from_item_html(html)),
+    "yahoo": lambda html: bool(sizes_from_html(html)[0]),
+    "snkrdunk": lambda html: parse_product_html("BENCH", html) is not None,
+}
+
+
+def recorded_paths(directory, site):
+
+    base = os.path.join(directory, site)
+
+    return f"{base}.har.zip", f"{base}.urls"
+
+
+def p95(times):
+
+    return sorted(times)[max(0, int(len(times) * 0.95) - 1)]
+
+
+# ===============================
+# 記録
+# ===============================
+async def record(p, urls, har, urls_path, timeout):
+
+    os.makedirs(os.path.dirname(har) or ".", exist_ok=True)
+
+    browser = await PROFILES[DEFAULT_PROFILE].launch(p)
+
+    context = await browser.new_context(record_har_path=har)
+
+    page = await context.new_page()
+
+    recorded = []
+
+    for url in urls:
+
+        try:
+
+            await page.goto(url, wait_until="load", timeout=timeout)
+
+            await page.wait_for_load_state("networkidle")
+
+            recorded.append(url)
+
+            print(f"[REC] {url}")
+
+        except Exception as e:
+
+            print(f"[WARN] record failed: {url} {e}")
+
+    # HAR は context を閉じた時に書き出される
+    await context.close()
+
+    await browser.close()
+
+    with open(urls_path, "w", encoding="utf-8") as f:
+        f.write("".join(f"{u}\n" for u in recorded))
+
+    print(f"[INFO] recorded {len(recorded)} pages -> {har}")
+
+
+# ===============================
+# 計測（1プロファイル）
+# ===============================
+async def run_profile(p, profile, check, urls, har, repeat, timeout) -> dict:
+
+    res = {
+        "profile": profile.name,
+        "launch_ms": 0.0,
+        "times": [],
+        "ok": 0,
+        "total": 0,
+        "peak_mb": 0.0,
+        "error": "",
+    }
+
+    t0 = time.perf_counter()
+
+    try:
+
+        browser = await profile.launch(p)
+
+    except Exception as e:
+
+        res["error"] = str(e).strip().splitlines()[0]
+
+        return res
+
+    res["launch_ms"] = (time.perf_counter() - t0) * 1000
+
+    try:
+
+        context = await browser.new_context()
+
+        if har:
+            await context.route_from_har(har, not_found="abort")
+
+        page = await context.new_page()
+
+        for _ in range(repeat):
+
+            for url in urls:
+
+                res["total"] += 1
+
+                t0 = time.perf_counter()
+
+                try:
+
+                    await page.goto(url, wait_until="load", timeout=timeout)
+
+                    res["times"].append((time.perf_counter() - t0) * 1000)
+
+                    html = await page.content()
+
+                except Exception as e:
+
+                    print(f"[WARN] {profile.name} {url} {e}")
+
+                    continue
+
+                if check(html):
+                    res["ok"] += 1
+
+                _, browser_mb = sample_rss()
+
+                res["peak_mb"] = max(res["peak_mb"], browser_mb)
+
+    finally:
+
+        await browser.close()
+
+    return res
+
+
+def report(site, results):
+
+    print(
+        f"\n[BENCH] site={site}\n"
+        f"  {'profile':14s} {'launch':>8s} {'ok/total':>9s} "
+        f"{'median':>8s} {'p95':>8s} {'peak_rss':>9s}"
+    )
+
+    for r in results:
+
+        if r["error"]:
+
+            print(f"  {r['profile']:14s} unavailable: {r['error']}")
+            continue
+
+        t = r["times"]
+
+        print(
+            f"  {r['profile']:14s} {r['launch_ms']:6.0f}ms "
+            f"{r['ok']:>4d}/{r['total']:<4d} "
+            f"{statistics.median(t) if t else 0:6.0f}ms "
+            f"{p95(t) if t else 0:6.0f}ms "
+            f"{r['peak_mb']:7.0f}MB"
+        )
+
+    usable = [r for r in results if not r["error"] and r["total"]]
+
+    if not usable:
+        return
+
+    best = max(r["ok"] / r["total"] for r in usable)
+
+    pick = min(
+        (r for r in usable if r["ok"] / r["total"] == best),
+        key=lambda r: (r["peak_mb"], statistics.median(r["times"] or [0]))
+    )
+
+    print(f"[BENCH] suggest BROWSER_PROFILE_{site.upper()}={pick['profile']}")
+
+
+async def main():
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--site", choices=list(CHECKS), default="mercari")
+    ap.add_argument("--dir", default=RECORDED_DIR, help="記録したページの保存先")
+    ap.add_argument("--record", nargs="+", metavar="URL", help="このページを記録して終了")
+    ap.add_argument("--live", action="store_true", help="記録を使わず実サイトを開く")
+    ap.add_argument("--urls", nargs="+", help="--live で開くページ")
+    ap.add_argument("--profiles", default=",".join(PROFILES))
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--timeout", type=int, default=30000)
+    args = ap.parse_args()
+
+    har, urls_path = recorded_paths(args.dir, args.site)
+
+    async with async_playwright() as p:
+
+        if args.record:
+
+            await record(p, args.record, har, urls_path, args.timeout)
+
+            return
+
+        if args.live:
+
+            har = None
+            urls = args.urls or []
+
+        elif os.path.exists(urls_path):
+
+            with open(urls_path, encoding="utf-8") as f:
+                urls = [u.strip() for u in f if u.strip()]
+
+        else:
+            urls = []
+
+        if not urls:
+
+            print(f"[WARN] no pages to load (record first: --site {args.site} --record URL ...)")
+            return
+
+        results = []
+
+        for name in args.profiles.split(","):
+
+            profile = PROFILES[name.strip()]
+
+            print(f"[INFO] {profile.name}: {len(urls)} pages x {args.repeat}")
+
+            results.append(await run_profile(
+                p,
+                profile,
+                CHECKS[args.site],
+                urls,
+                har,
+                args.repeat,
+                args.timeout
+            ))
+
+    report(args.site, results)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,159 @@
+# =========================================================
+# SNKRDUNK 商品ページ抽出ベンチマーク
+#  - 旧方式: query_selector / text_content を要素ごとに呼ぶ（往復多数）
+#  - 新方式: extract_product()（evaluate 1回）
+#  - 保存済み HTML（--html）か、合成ページを set_content で読み込んで比較
+#
+#  python bench_snkrdunk_extract.py [--html page.html] [--rows 12] [--repeat 50]
+# =========================================================
+
+import time
+import asyncio
+import argparse
+import statistics
+
+from playwright.async_api import async_playwright
+
+from main_snkrdunk_product import extract_product
+from browser_profiles import launch_browser
+
+
+def synthetic_page(rows: int) -> str:
+
+    trs = "\n".join(
+        f"<tr><th>項目{i}</th><td>値{i}</td></tr>" for i in range(rows - 4)
+    )
+
+    return f"""
+<html><body>
+<h1>Nike Dunk Low Retro White Black</h1>
+<p class="product-name-jp">ナイキ ダンク ロー レトロ ホワイト ブラック</p>
+<img src="https://cdn.snkrdunk.com/upload_bg_removed/DD1391-100.png">
+<table class="product-detail-info-table">
+<tr><th>ブランド</th><td>Nike</td></tr>
+<tr><th>モデル</th><td>Dunk Low</td></tr>
+<tr><th>発売日</th><td>2021/01/14</td></tr>
+<tr><th>定価</th><td>¥11,000</td></tr>
+{trs}
+</table>
+</body></html>
+"""
+
+
+# ===============================
+# 旧方式（比較用にそのまま残す）
+# ===============================
+async def extract_multi_call(page, product_code):
+
+    name = await page.text_content("h1")
+
+    name_jp = ""
+    jp = await page.query_selector("p.product-name-jp")
+
+    if jp:
+        name_jp = (await jp.text_content()).strip()
+
+    info = {}
+
+    rows = await page.query_selector_all(
+        "table.product-detail-info-table tr"
+    )
+
+    for r in rows:
+
+        th = await r.query_selector("th")
+        td = await r.query_selector("td")
+
+        if th and td:
+
+            k = (await th.text_content()).strip()
+            v = (await td.text_content()).strip()
+
+            info[k] = v
+
+    img_url = None
+
+    img = page.locator('img[src*="upload_bg_removed"]').first
+
+    if await img.count() > 0:
+        img_url = await img.get_attribute("src")
+
+    if not img_url:
+
+        img = page.locator('img[src*="cdn.snkrdunk.com"]').first
+
+        if await img.count() > 0:
+            img_url = await img.get_attribute("src")
+
+    return {
+        "ID": product_code,
+        "NAME": name.strip() if name else "",
+        "NAME_JP": name_jp,
+        "BRAND": info.get("ブランド", ""),
+        "MODEL": info.get("モデル", ""),
+        "RELEASE": info.get("発売日", ""),
+        "PRICE": info.get("定価", ""),
+        "IMG": img_url or ""
+    }
+
+
+async def measure(page, fn, repeat):
+
+    times = []
+
+    for _ in range(repeat):
+
+        t0 = time.perf_counter()
+        res = await fn(page, "BENCH")
+        times.append((time.perf_counter() - t0) * 1000)
+
+    return res, times
+
+
+async def main():
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--html", help="保存済みの商品ページ HTML")
+    ap.add_argument("--rows", type=int, default=12)
+    ap.add_argument("--repeat", type=int, default=50)
+    args = ap.parse_args()
+
+    if args.html:
+        with open(args.html, encoding="utf-8") as f:
+            html = f.read()
+    else:
+        html = synthetic_page(args.rows)
+
+    async with async_playwright() as p:
+
+        browser = await launch_browser(p, "snkrdunk")
+
+        page = await browser.new_page()
+
+        await page.set_content(html)
+
+        old, t_old = await measure(page, extract_multi_call, args.repeat)
+        new, t_new = await measure(page, extract_product, args.repeat)
+
+        await browser.close()
+
+    if old != new:
+        print("[WARN] 抽出結果が一致しません")
+        print(" old:", old)
+        print(" new:", new)
+
+    for label, t in (("multi-call", t_old), ("evaluate", t_new)):
+        print(
+            f"[BENCH] {label:10s} "
+            f"median={statistics.median(t):.2f}ms "
+            f"p95={sorted(t)[int(len(t) * 0.95) - 1]:.2f}ms"
+        )
+
+    print(
+        f"[BENCH] speedup x"
+        f"{statistics.median(t_old) / statistics.median(t_new):.1f}"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,173 @@
+# =========================================================
+# ブラウザの起動プロファイル
+#  - chromium:      これまでと同じ（headless Chromium）
+#  - chromium-lean: レンダラープロセス数 / JS ヒープの上限、GPU・サイト分離なし
+#  - firefox:       コンテンツプロセス数 / JS ヒープの上限、先読みなし
+#  - webkit:        既定のまま
+#  - サイトごとに BROWSER_PROFILE_<SITE>（例: BROWSER_PROFILE_MERCARI）、
+#    無ければ BROWSER_PROFILE、どちらも無ければ chromium
+#  - 起動できない時（エンジン未インストールなど）は chromium で起動し直す
+#  - どれが安いかは bench_browser_profiles.py で比較
+#
+#  python browser_profiles.py list
+#  python browser_profiles.py engines   # playwright install に渡すエンジン名
+# =========================================================
+
+import os
+import sys
+from dataclasses import dataclass, field
+
+
+DEFAULT_PROFILE = "chromium"
+
+SITES = ("mercari", "yahoo", "snkrdunk")
+
+# レンダラー / コンテンツプロセスの上限
+BROWSER_RENDERER_LIMIT = int(os.environ.get("BROWSER_RENDERER_LIMIT", 2))
+
+# 1プロセスあたりの JS ヒープ上限
+BROWSER_JS_HEAP_MB = int(os.environ.get("BROWSER_JS_HEAP_MB", 512))
+
+BASE_ARGS = ("--no-sandbox", "--disable-dev-shm-usage")
+
+
+@dataclass(frozen=True)
+class LaunchProfile:
+
+    name: str
+    engine: str = "chromium"
+    args: tuple = ()
+    prefs: dict = field(default_factory=dict)
+
+    def launch_options(self) -> dict:
+
+        options = {"headless": True}
+
+        if self.args:
+            options["args"] = list(self.args)
+
+        if self.prefs:
+            options["firefox_user_prefs"] = dict(self.prefs)
+
+        return options
+
+    async def launch(self, p):
+
+        return await getattr(p, self.engine).launch(**self.launch_options())
+
+
+# Playwright 1.42 の headless Chromium は旧 headless（headless shell）で起動し、
+# --disable-background-networking も既定で付く。lean では明示しておく
+PROFILES = {
+    profile.name: profile
+    for profile in (
+        LaunchProfile("chromium", args=BASE_ARGS),
+        LaunchProfile(
+            "chromium-lean",
+            args=BASE_ARGS + (
+                f"--renderer-process-limit={BROWSER_RENDERER_LIMIT}",
+                f"--js-flags=--max-old-space-size={BROWSER_JS_HEAP_MB}",
+                "--disable-background-networking",
+                "--disable-site-isolation-trials",
+                "--disable-gpu",
+                "--mute-audio",
+            ),
+        ),
+        LaunchProfile(
+            "firefox",
+            engine="firefox",
+            prefs={
+                "dom.ipc.processCount": BROWSER_RENDERER_LIMIT,
+                "fission.autostart": False,
+                "javascript.options.mem.max": BROWSER_JS_HEAP_MB * 1024,
+                "network.prefetch-next": False,
+                "network.dns.disablePrefetch": True,
+                "network.http.speculative-parallel-limit": 0,
+                "browser.safebrowsing.malware.enabled": False,
+                "browser.safebrowsing.phishing.enabled": False,
+            },
+        ),
+        LaunchProfile("webkit", engine="webkit"),
+    )
+}
+
+
+def profile_name(site: str) -> str:
+
+    return (
+        os.environ.get(f"BROWSER_PROFILE_{site.upper()}")
+        or os.environ.get("BROWSER_PROFILE")
+        or DEFAULT_PROFILE
+    ).strip().lower()
+
+
+def get_profile(site: str) -> LaunchProfile:
+
+    name = profile_name(site)
+
+    if name not in PROFILES:
+
+        print(f"[WARN] unknown browser profile {name}, use {DEFAULT_PROFILE}")
+
+        name = DEFAULT_PROFILE
+
+    return PROFILES[name]
+
+
+# ===============================
+# 起動（各スクレイパーから）
+# ===============================
+async def launch_browser(p, site: str):
+
+    profile = get_profile(site)
+
+    try:
+
+        browser = await profile.launch(p)
+
+    except Exception as e:
+
+        if profile.name == DEFAULT_PROFILE:
+            raise
+
+        print(f"[WARN] browser profile {profile.name} failed, fallback to {DEFAULT_PROFILE}: {e}")
+
+        profile = PROFILES[DEFAULT_PROFILE]
+
+        browser = await profile.launch(p)
+
+    print(f"[INFO] browser {site}: profile={profile.name} version={browser.version}")
+
+    return browser
+
+
+def engines() -> list:
+
+    # フォールバック用に chromium は常に入れる
+    needed = {PROFILES[DEFAULT_PROFILE].engine}
+
+    for site in SITES:
+
+        name = profile_name(site)
+
+        if name in PROFILES:
+            needed.add(PROFILES[name].engine)
+
+    return sorted(needed)
+
+
+if __name__ == "__main__":
+
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "list"
+
+    if cmd == "engines":
+
+        print(" ".join(engines()))
+
+    else:
+
+        for site in SITES:
+            print(f"{site:10s} {get_profile(site).name}")
+
+        for profile in PROFILES.values():
+            print(f"  {profile.name:14s} {profile.engine:9s} {' '.join(profile.args)}")
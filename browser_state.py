@@ -0,0 +1,110 @@
+# =========================================================
+# Playwright のストレージ状態（Cookie / localStorage）の持ち越し
+#  - 実行の終わりに context.storage_state() をサイト別のファイルへ保存
+#  - 次回はそのファイルでコンテキストを作る（同意画面・bot チェックを省く）
+#  - 古い（BROWSER_STATE_MAX_AGE_HOURS 超）/ 壊れている / Cookie が全部
+#    期限切れのファイルは使わない
+#  - ブロックされた時は invalidate() で捨て、次の保存で作り直す
+# =========================================================
+
+import os
+import json
+import time
+import uuid
+
+
+BROWSER_STATE_DIR = os.environ.get("BROWSER_STATE_DIR", "cache/browser_state")
+
+BROWSER_STATE_MAX_AGE_HOURS = float(
+    os.environ.get("BROWSER_STATE_MAX_AGE_HOURS", 24)
+)
+
+
+class BrowserState:
+
+    def __init__(self, site: str, directory: str = BROWSER_STATE_DIR):
+
+        self.site = site
+        self.path = os.path.join(directory, f"{site}.json")
+
+        self.enabled = os.environ.get("BROWSER_STATE", "1") != "0"
+
+        self.valid = self.enabled and self._check()
+
+    def _check(self) -> bool:
+
+        try:
+
+            age = time.time() - os.path.getmtime(self.path)
+
+            with open(self.path, encoding="utf-8") as f:
+                state = json.load(f)
+
+        except FileNotFoundError:
+            return False
+
+        except (OSError, ValueError) as e:
+
+            print(f"[WARN] browser state {self.site} unreadable: {e}")
+            return False
+
+        if age > BROWSER_STATE_MAX_AGE_HOURS * 3600:
+
+            print(f"[INFO] browser state {self.site} stale ({age / 3600:.0f}h)")
+            return False
+
+        cookies = state.get("cookies") if isinstance(state, dict) else None
+
+        if not cookies:
+            return False
+
+        now = time.time()
+
+        # expires=-1 はセッション Cookie
+        if not any(c.get("expires", -1) == -1 or c.get("expires", 0) > now for c in cookies):
+
+            print(f"[INFO] browser state {self.site} cookies expired")
+            return False
+
+        print(f"[INFO] browser state {self.site} restored ({len(cookies)} cookies)")
+
+        return True
+
+    def context_options(self) -> dict:
+
+        return {"storage_state": self.path} if self.valid else {}
+
+    async def save(self, context):
+
+        if not self.enabled:
+            return
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+        # 並行して保存しても壊れないよう一時ファイルは毎回別名
+        tmp = f"{self.path}.{uuid.uuid4().hex}.tmp"
+
+        try:
+
+            await context.storage_state(path=tmp)
+
+            os.replace(tmp, self.path)
+
+            self.valid = True
+
+        except Exception as e:
+
+            print(f"[WARN] browser state {self.site} not saved: {e}")
+
+    def invalidate(self, reason: str = ""):
+
+        self.valid = False
+
+        try:
+
+            os.remove(self.path)
+
+            print(f"[INFO] browser state {self.site} dropped {reason}")
+
+        except OSError:
+            pass
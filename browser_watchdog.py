@@ -0,0 +1,236 @@
+# =========================================================
+# ブラウザのメモリ監視
+#  - Python プロセスと、ブラウザ（Playwright ドライバ node の子孫）の RSS を
+#    /proc から集計（node 自身や ParsePool のワーカーは数えない）
+#  - RSS が上限を超えた / ナビゲーション回数が上限に達したら
+#    should_recycle() が True（呼び出し側でコンテキストを作り直す）
+#  - 作り直した直後の RSS から BROWSER_RSS_GROWTH_MB 増えるまでは
+#    RSS では作り直さない（ベースラインが上限を超えていても毎回作り直さない）
+#  - サンプルは [MEM] 行で出力し、MEMORY_LOG を指定すると CSV にも残す
+# =========================================================
+
+import os
+import time
+
+from sharding import BROWSER_MEMORY_MB
+
+
+# ブラウザ側の RSS がこれを超えたら作り直す
+BROWSER_RSS_LIMIT_MB = int(
+    os.environ.get("BROWSER_RSS_LIMIT_MB", BROWSER_MEMORY_MB)
+)
+
+# 作り直した後、ここまで増えたら再度 RSS で作り直す
+BROWSER_RSS_GROWTH_MB = int(os.environ.get("BROWSER_RSS_GROWTH_MB", 128))
+
+# 1コンテキストで許すナビゲーション回数
+PAGE_MAX_NAVIGATIONS = int(os.environ.get("PAGE_MAX_NAVIGATIONS", 300))
+
+MEMORY_LOG = os.environ.get("MEMORY_LOG", "")
+
+
+def _rss_mb(pid) -> float:
+
+    try:
+
+        with open(f"/proc/{pid}/status") as f:
+
+            for line in f:
+
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+
+    except OSError:
+        pass
+
+    return 0.0
+
+
+def _process_table() -> tuple:
+
+    children = {}
+    names = {}
+
+    try:
+        pids = [int(p) for p in os.listdir("/proc") if p.isdigit()]
+    except OSError:
+        return children, names
+
+    for pid in pids:
+
+        try:
+
+            with open(f"/proc/{pid}/stat") as f:
+                stat = f.read()
+
+        except OSError:
+            continue
+
+        # comm に空白や括弧が入ることがあるので最後の ")" の後ろを読む
+        head, tail = stat.rsplit(")", 1)
+
+        ppid = int(tail.split()[1])
+
+        names[pid] = head.split("(", 1)[1]
+
+        children.setdefault(ppid, []).append(pid)
+
+    return children, names
+
+
+def _descendants(root, children) -> list:
+
+    out = []
+    stack = [root]
+
+    while stack:
+
+        for c in children.get(stack.pop(), []):
+
+            out.append(c)
+            stack.append(c)
+
+    return out
+
+
+def sample_rss() -> tuple:
+
+    pid = os.getpid()
+
+    children, names = _process_table()
+
+    # Playwright ドライバ（node）の下がブラウザ
+    drivers = [c for c in children.get(pid, []) if names.get(c) == "node"]
+
+    browser = sum(
+        _rss_mb(c)
+        for d in drivers
+        for c in _descendants(d, children)
+    )
+
+    return _rss_mb(pid), browser
+
+
+class MemoryWatchdog:
+
+    def __init__(
+        self,
+        limit_mb: int = BROWSER_RSS_LIMIT_MB,
+        growth_mb: int = BROWSER_RSS_GROWTH_MB,
+        max_navigations: int = PAGE_MAX_NAVIGATIONS,
+        log_path: str = MEMORY_LOG
+    ):
+
+        self.limit_mb = limit_mb
+        self.growth_mb = growth_mb
+        self.max_navigations = max_navigations
+        self.log_path = log_path
+
+        self.started = time.monotonic()
+
+        self.navigations = 0
+        self.recycles = 0
+
+        self.peak_py = 0.0
+        self.peak_browser = 0.0
+
+        self.last_browser = 0.0
+
+        # 前回作り直した直後のブラウザ RSS
+        self.after_recycle = 0.0
+
+        self.samples = []
+
+    # ===============================
+    # ナビゲーション数（page.on("framenavigated") から呼ぶ）
+    # ===============================
+    def on_navigated(self, frame):
+
+        if frame.parent_frame is None:
+            self.navigations += 1
+
+    def watch(self, page):
+
+        page.on("framenavigated", self.on_navigated)
+
+    # ===============================
+    # 計測
+    # ===============================
+    def sample(self, label: str = ""):
+
+        py, browser = sample_rss()
+
+        elapsed = time.monotonic() - self.started
+
+        self.peak_py = max(self.peak_py, py)
+        self.peak_browser = max(self.peak_browser, browser)
+
+        self.last_browser = browser
+
+        self.samples.append((
+            round(elapsed, 1),
+            round(py, 1),
+            round(browser, 1),
+            self.navigations,
+            label,
+        ))
+
+        print(
+            f"[MEM] pid={os.getpid()} t={elapsed:.0f}s "
+            f"python={py:.0f}MB browser={browser:.0f}MB "
+            f"navs={self.navigations} {label}"
+        )
+
+        return py, browser
+
+    def should_recycle(self) -> bool:
+
+        return (
+            self.navigations >= self.max_navigations
+            or (
+                self.last_browser >= self.limit_mb
+                and self.last_browser >= self.after_recycle + self.growth_mb
+            )
+        )
+
+    def recycled(self):
+
+        self.recycles += 1
+        self.navigations = 0
+
+        _, browser = self.sample("recycled")
+
+        self.after_recycle = browser
+
+        if browser >= self.limit_mb:
+            print(
+                f"[WARN] browser RSS {browser:.0f}MB still over "
+                f"{self.limit_mb}MB after recycle"
+            )
+
+    def summary(self) -> str:
+
+        return (
+            f"[INFO] memory: peak python={self.peak_py:.0f}MB "
+            f"peak browser={self.peak_browser:.0f}MB "
+            f"recycles={self.recycles}"
+        )
+
+    def save(self):
+
+        if not self.log_path or not self.samples:
+            return
+
+        os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+
+        new = not os.path.exists(self.log_path)
+
+        with open(self.log_path, "a", encoding="utf-8") as f:
+
+            if new:
+                f.write("pid,elapsed_s,python_mb,browser_mb,navigations,label\n")
+
+            for row in self.samples:
+                f.write(",".join(str(v) for v in (os.getpid(),) + row) + "\n")
+
+        self.samples = []
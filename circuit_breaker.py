@@ -0,0 +1,410 @@
+# =========================================================
+# サイト単位のサーキットブレーカー
+#  - 直近 BREAKER_WINDOW 回のうち失敗（ブロック・タイムアウト）の割合が
+#    BREAKER_ERROR_RATE を超えたら open（リクエストを止めて待つ）
+#  - 待ち時間は trip のたびに倍（BREAKER_COOLDOWN_SEC 〜 BREAKER_MAX_COOLDOWN_SEC）
+#  - 待ち明けは1リクエストだけ試し（half-open）、成功したら再開
+#  - BREAKER_MAX_TRIPS 回続けて復帰できなければ SiteDown
+#    （呼び出し側はそこまでの結果を書き込んで早めに終了する）
+#  - record(False) はサイト側の不調（タイムアウト / 403 / 429 / 5xx）だけ。
+#    こちらの不具合で失敗した時は release() で試行枠だけ返す
+#  - acquire() は番号（token）を返す。record / release には同じ token を渡す
+#    （試行の結果は試行枠を取った呼び出しだけ、trip 前に始まったリクエストは数えない）
+#  - BREAKER_STATE_DIR があれば trip / 復帰 / SiteDown をファイルで共有
+#    （sharding が実行ごとに作って子プロセスへ渡す。試行も全プロセスで1件）
+# =========================================================
+
+import os
+import json
+import time
+import asyncio
+from collections import deque
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+BREAKER_WINDOW = int(os.environ.get("BREAKER_WINDOW", 20))
+BREAKER_MIN_CALLS = int(os.environ.get("BREAKER_MIN_CALLS", 5))
+BREAKER_ERROR_RATE = float(os.environ.get("BREAKER_ERROR_RATE", 0.5))
+BREAKER_COOLDOWN_SEC = float(os.environ.get("BREAKER_COOLDOWN_SEC", 30))
+BREAKER_MAX_COOLDOWN_SEC = float(os.environ.get("BREAKER_MAX_COOLDOWN_SEC", 600))
+BREAKER_MAX_TRIPS = int(os.environ.get("BREAKER_MAX_TRIPS", 4))
+
+# 他のプロセスが試行中の時に見に行く間隔
+BREAKER_POLL_SEC = float(os.environ.get("BREAKER_POLL_SEC", 1))
+
+# 試行したプロセスが結果を返さずに落ちた時、他が試行を引き取るまでの時間
+BREAKER_PROBE_LEASE_SEC = float(os.environ.get("BREAKER_PROBE_LEASE_SEC", 180))
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class SiteDown(Exception):
+    pass
+
+
+def is_site_down_status(status: int) -> bool:
+
+    return status in (403, 429) or status >= 500
+
+
+# ===============================
+# プロセス間で共有する状態
+#  - {"gen", "state", "until", "trips", "total", "cooldown", "probe", "lease"}
+#  - gen は trip / 復帰のたびに増える。読んだ時と gen が違えば更新しない
+#  - 読むのはロックなし（書き込みは一時ファイル → os.replace）
+# ===============================
+class SharedState:
+
+    def __init__(self, path: str):
+
+        self.path = path
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def read(self):
+
+        try:
+
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+
+        except (OSError, ValueError):
+            return None
+
+    def update(self, data: dict, fn, bump: bool = True):
+
+        with open(self.path + ".lock", "w") as lock:
+
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+
+            current = self.read() or data
+
+            if current["gen"] != data["gen"]:
+                return current, False
+
+            new = fn(dict(current))
+
+            if new is None:
+                return current, False
+
+            if bump:
+                new["gen"] += 1
+
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(new, f)
+
+            os.replace(tmp, self.path)
+
+            return new, True
+
+
+class CircuitBreaker:
+
+    def __init__(
+        self,
+        site: str,
+        window: int = BREAKER_WINDOW,
+        min_calls: int = BREAKER_MIN_CALLS,
+        error_rate: float = BREAKER_ERROR_RATE,
+        cooldown: float = BREAKER_COOLDOWN_SEC,
+        max_cooldown: float = BREAKER_MAX_COOLDOWN_SEC,
+        max_trips: int = BREAKER_MAX_TRIPS,
+        state_dir: str = None
+    ):
+
+        self.site = site
+
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.max_trips = max_trips
+
+        self.results = deque(maxlen=window)
+
+        self.state = CLOSED
+        self.cooldown = cooldown
+        self.open_until = 0.0
+
+        # 復帰できないまま続いた trip 回数
+        self.trips = 0
+        self.total_trips = 0
+
+        self._data = {
+            "gen": 0,
+            "state": CLOSED,
+            "until": 0.0,
+            "trips": 0,
+            "total": 0,
+            "cooldown": cooldown,
+            "probe": "",
+            "lease": 0.0,
+        }
+
+        # 共有ファイルの置き場所（空なら共有しない）
+        if state_dir is None:
+            state_dir = os.environ.get("BREAKER_STATE_DIR", "")
+
+        self._shared = (
+            SharedState(os.path.join(state_dir, f"{site}.json"))
+            if state_dir else None
+        )
+
+        # 払い出した token と、これ以下の token の結果は数えない境目
+        self._issued = 0
+        self._cutoff = 0
+
+        # 試行枠を持っている token（共有ファイルでは owner で誰の試行か見分ける）
+        self._probe = None
+        self._owner = f"{os.getpid()}-{id(self)}"
+
+        self._changed = asyncio.Event()
+
+    @property
+    def down(self) -> bool:
+        return self.trips >= self.max_trips
+
+    def _notify(self):
+
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _ticket(self) -> int:
+
+        self._issued += 1
+
+        return self._issued
+
+    # ===============================
+    # 状態の更新（共有していればファイル側で、gen が同じ時だけ）
+    # ===============================
+    def _commit(self, fn, bump: bool = True) -> bool:
+
+        if self._shared:
+
+            data, applied = self._shared.update(self._data, fn, bump)
+
+        else:
+
+            data = fn(dict(self._data))
+            applied = data is not None
+
+            if not applied:
+                data = self._data
+            elif bump:
+                data["gen"] += 1
+
+        if bump or not applied:
+            self._adopt(data, applied)
+        else:
+            self._data = data
+
+        return applied
+
+    def _sync(self):
+
+        if not self._shared:
+            return
+
+        data = self._shared.read()
+
+        if data and data["gen"] != self._data["gen"]:
+            self._adopt(data, False)
+
+    def _adopt(self, data: dict, own: bool):
+
+        if data["gen"] == self._data["gen"]:
+            return
+
+        self._data = data
+
+        self.trips = data["trips"]
+        self.total_trips = data["total"]
+        self.cooldown = data["cooldown"]
+
+        # 状態が変わる前に始まったリクエストの結果は数えない
+        self.results.clear()
+        self._cutoff = self._issued
+        self._probe = None
+
+        by = "" if own else " (another worker)"
+
+        if data["state"] == CLOSED:
+
+            if self.state != CLOSED:
+                print(f"[INFO] {self.site} circuit closed{by}")
+
+            self.state = CLOSED
+            self.open_until = 0.0
+
+        else:
+
+            self.state = OPEN
+            self.open_until = time.monotonic() + data["until"] - time.time()
+
+            if self.down:
+                print(f"[ERROR] {self.site} still failing after {self.trips} trips, give up{by}")
+            else:
+                print(f"[WARN] {self.site} circuit open, cool down {self.cooldown:.0f}s{by}")
+
+        self._notify()
+
+    def _trip(self, data: dict) -> dict:
+
+        cooldown = data["cooldown"]
+
+        if data["trips"]:
+            cooldown = min(cooldown * 2, self.max_cooldown)
+
+        data.update(
+            state=OPEN,
+            until=time.time() + cooldown,
+            trips=data["trips"] + 1,
+            total=data["total"] + 1,
+            cooldown=cooldown,
+            probe="",
+            lease=0.0,
+        )
+
+        return data
+
+    def _close(self, data: dict) -> dict:
+
+        data.update(
+            state=CLOSED,
+            until=0.0,
+            trips=0,
+            cooldown=self.base_cooldown,
+            probe="",
+            lease=0.0,
+        )
+
+        return data
+
+    def _claim(self, data: dict):
+
+        now = time.time()
+
+        # 他のプロセスが試行中（結果を返さずに落ちていれば lease 切れで引き取る）
+        if data["probe"] not in ("", self._owner) and data["lease"] > now:
+            return None
+
+        data.update(probe=self._owner, lease=now + BREAKER_PROBE_LEASE_SEC)
+
+        return data
+
+    def _unclaim(self, data: dict) -> dict:
+
+        data.update(probe="", lease=0.0)
+
+        return data
+
+    async def _wait(self):
+
+        changed = self._changed.wait()
+
+        if not self._shared:
+            await changed
+            return
+
+        # 他のプロセスの復帰 / trip はファイルを見に行くまで分からない
+        try:
+            await asyncio.wait_for(changed, BREAKER_POLL_SEC)
+        except asyncio.TimeoutError:
+            pass
+
+    # ===============================
+    # リクエスト前に呼ぶ
+    #  - open 中は待ち、half-open では1件だけ通す
+    #  - 戻り値の token を record / release に渡す
+    # ===============================
+    async def acquire(self) -> int:
+
+        while True:
+
+            self._sync()
+
+            if self.down:
+                raise SiteDown(self.site)
+
+            if self.state == CLOSED:
+                return self._ticket()
+
+            if self.state == OPEN:
+
+                wait = self.open_until - time.monotonic()
+
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    continue
+
+                self.state = HALF_OPEN
+
+            if self._probe is None and self._commit(self._claim, bump=False):
+
+                self._probe = self._ticket()
+
+                print(f"[INFO] {self.site} probing")
+
+                return self._probe
+
+            await self._wait()
+
+    # ===============================
+    # リクエスト後に結果を記録
+    # ===============================
+    def record(self, ok: bool, token: int):
+
+        if token == self._probe:
+
+            self._probe = None
+
+            self._commit(self._close if ok else self._trip)
+
+            return
+
+        self._sync()
+
+        # half-open の試行枠以外 / trip 前に始まったリクエストは数えない
+        if self.state != CLOSED or token <= self._cutoff:
+            return
+
+        self.results.append(ok)
+
+        if len(self.results) < self.min_calls:
+            return
+
+        failed = self.results.count(False) / len(self.results)
+
+        if failed >= self.error_rate:
+            self._commit(self._trip)
+
+    # ===============================
+    # 結果を数えずに試行枠を返す（サイトの状態と関係ない失敗）
+    # ===============================
+    def release(self, token: int):
+
+        if token == self._probe:
+
+            self._probe = None
+
+            self._commit(self._unclaim, bump=False)
+
+            self._notify()
+
+    def summary(self) -> str:
+
+        return (
+            f"[INFO] breaker {self.site}: state={self.state} "
+            f"trips={self.total_trips} down={self.down}"
+        )
@@ -0,0 +1,133 @@
+# =========================================================
+# 共有 HTTP クライアント
+#  - requests.Session をプロセス内で1つ使い回す（接続プール）
+#  - get_cached(): ETag / Last-Modified をディスクに保存し、
+#    次回は条件付きリクエスト（304 ならキャッシュ本文を返す）
+# =========================================================
+
+import os
+import json
+import time
+import hashlib
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+UA = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0.0.0 Safari/537.36"
+)
+
+HTTP_CACHE_DIR = os.environ.get("HTTP_CACHE_DIR", "cache/http")
+
+POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", 16))
+
+
+_session = None
+
+
+def get_session() -> requests.Session:
+
+    global _session
+
+    if _session is None:
+
+        s = requests.Session()
+
+        adapter = HTTPAdapter(
+            pool_connections=POOL_SIZE,
+            pool_maxsize=POOL_SIZE
+        )
+
+        s.mount("https://", adapter)
+        s.mount("http://", adapter)
+
+        s.headers["User-Agent"] = UA
+
+        _session = s
+
+    return _session
+
+
+# ===============================
+# ディスクキャッシュ
+# ===============================
+def _cache_path(url: str) -> str:
+
+    h = hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    return os.path.join(HTTP_CACHE_DIR, h[:2], h + ".json")
+
+
+def _read_cache(url: str):
+
+    try:
+
+        with open(_cache_path(url), encoding="utf-8") as f:
+            return json.load(f)
+
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache(url: str, entry: dict):
+
+    path = _cache_path(url)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    tmp = path + ".tmp"
+
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(entry, f, ensure_ascii=False)
+
+    os.replace(tmp, path)
+
+
+# ===============================
+# 条件付き GET
+#  - 戻り値: (status, text, from_cache)
+#  - max_age 秒以内に取得済みなら問い合わせずにキャッシュを返す
+# ===============================
+def get_cached(url: str, headers=None, timeout=20, max_age=0):
+
+    entry = _read_cache(url)
+
+    if entry and max_age and time.time() - entry.get("ts", 0) < max_age:
+        return 200, entry["body"], True
+
+    req_headers = dict(headers or {})
+
+    if entry:
+
+        if entry.get("etag"):
+            req_headers["If-None-Match"] = entry["etag"]
+
+        if entry.get("last_modified"):
+            req_headers["If-Modified-Since"] = entry["last_modified"]
+
+    r = get_session().get(url, headers=req_headers, timeout=timeout)
+
+    if r.status_code == 304 and entry:
+
+        entry["ts"] = time.time()
+
+        _write_cache(url, entry)
+
+        return 200, entry["body"], True
+
+    if r.status_code == 200 and (
+        r.headers.get("ETag") or r.headers.get("Last-Modified")
+    ):
+
+        _write_cache(url, {
+            "url": url,
+            "etag": r.headers.get("ETag"),
+            "last_modified": r.headers.get("Last-Modified"),
+            "ts": time.time(),
+            "body": r.text,
+        })
+
+    return r.status_code, r.text, False
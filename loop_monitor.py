@@ -0,0 +1,186 @@
+# =========================================================
+# イベントループの遅延（lag）監視
+#  - ループ上で LOOP_LAG_INTERVAL_MS ごとに sleep し、予定より遅れた分を lag として記録
+#  - 別スレッドがループの止まりを検知し、その時点で実行中のスタックを取得
+#    （requests / gspread / BeautifulSoup などのブロッキング処理の特定用）
+#  - 終了時に lag の分布と、止めていた箇所の上位を出力
+#  - LOOP_LAG_MONITOR=0 で無効
+# =========================================================
+
+import os
+import sys
+import time
+import asyncio
+import threading
+import traceback
+
+
+LOOP_LAG_MONITOR = os.environ.get("LOOP_LAG_MONITOR", "1") != "0"
+
+LOOP_LAG_INTERVAL_MS = float(os.environ.get("LOOP_LAG_INTERVAL_MS", 50))
+
+LOOP_LAG_THRESHOLD_MS = float(os.environ.get("LOOP_LAG_THRESHOLD_MS", 100))
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+TOP_N = 10
+
+
+def _offender(stack) -> str:
+
+    # 自分たちのコードで一番内側のフレーム（無ければ一番内側）
+    for fr in reversed(stack):
+
+        if fr.filename.startswith(REPO_DIR) and not fr.filename.endswith(
+            ("loop_monitor.py", "profiling.py")
+        ):
+            return f"{os.path.basename(fr.filename)}:{fr.lineno} {fr.name}"
+
+    fr = stack[-1]
+
+    return f"{os.path.basename(fr.filename)}:{fr.lineno} {fr.name}"
+
+
+class LoopMonitor:
+
+    def __init__(
+        self,
+        interval_ms: float = LOOP_LAG_INTERVAL_MS,
+        threshold_ms: float = LOOP_LAG_THRESHOLD_MS
+    ):
+
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+
+        self.lags = []
+
+        # offender -> [回数, 合計 lag, 最大 lag, スタック]
+        self.offenders = {}
+
+        self._beat = time.monotonic()
+        self._beats = 0
+
+        self._pending = None
+        self._captured_at = -1
+
+        self._task = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    # ===============================
+    # ループ側
+    # ===============================
+    async def _tick(self):
+
+        while True:
+
+            self._beat = time.monotonic()
+            self._beats += 1
+
+            await asyncio.sleep(self.interval)
+
+            lag = time.monotonic() - self._beat - self.interval
+
+            self.lags.append(lag)
+
+            if lag < self.threshold:
+                continue
+
+            offender, stack = self._pending or ("(not captured)", [])
+
+            self._pending = None
+
+            s = self.offenders.setdefault(offender, [0, 0.0, 0.0, stack])
+
+            s[0] += 1
+            s[1] += lag
+
+            if lag > s[2]:
+                s[2] = lag
+                s[3] = stack or s[3]
+
+    # ===============================
+    # 監視スレッド側（ループが止まっている間にスタックを取る）
+    # ===============================
+    def _watch(self, loop_thread):
+
+        while not self._stop.wait(self.threshold / 2):
+
+            stalled = time.monotonic() - self._beat - self.interval
+
+            if stalled < self.threshold or self._captured_at == self._beats:
+                continue
+
+            frame = sys._current_frames().get(loop_thread)
+
+            if frame is None:
+                continue
+
+            stack = traceback.extract_stack(frame)
+
+            self._pending = (_offender(stack), stack)
+            self._captured_at = self._beats
+
+    def start(self):
+
+        self._task = asyncio.get_running_loop().create_task(self._tick())
+
+        self._thread = threading.Thread(
+            target=self._watch,
+            args=(threading.get_ident(),),
+            name="loop-lag-monitor",
+            daemon=True
+        )
+
+        self._thread.start()
+
+    def stop(self):
+
+        self._stop.set()
+
+        if self._task:
+            self._task.cancel()
+
+        if self._thread:
+            self._thread.join()
+
+    # ===============================
+    # 集計
+    # ===============================
+    def summary(self) -> str:
+
+        if not self.lags:
+            return "[INFO] loop lag: no samples"
+
+        lags = sorted(self.lags)
+
+        def pct(p):
+            return lags[min(len(lags) - 1, int(len(lags) * p))] * 1000
+
+        stalls = sum(s[0] for s in self.offenders.values())
+
+        lines = [
+            f"[INFO] loop lag: ticks={len(lags)} p50={pct(0.5):.0f}ms "
+            f"p99={pct(0.99):.0f}ms max={lags[-1] * 1000:.0f}ms "
+            f"stalls(>{self.threshold * 1000:.0f}ms)={stalls} "
+            f"stalled={sum(s[1] for s in self.offenders.values()):.1f}s"
+        ]
+
+        worst = sorted(self.offenders.items(), key=lambda kv: -kv[1][1])
+
+        for i, (offender, (count, total, longest, stack)) in enumerate(worst[:TOP_N]):
+
+            lines.append(
+                f"[INFO]   {total:7.1f}s max={longest * 1000:.0f}ms "
+                f"n={count} {offender}"
+            )
+
+            # 上位3件は呼び出し元も出す
+            if i < 3:
+
+                for fr in stack[-6:]:
+                    lines.append(
+                        f"[INFO]       {os.path.basename(fr.filename)}:{fr.lineno} {fr.name}"
+                    )
+
+        return "\n".join(lines)
@@ -1,100 +1,225 @@
 import asyncio
-import gspread
 import os
-import json
 
 from playwright.async_api import async_playwright
-from google.oauth2.service_account import Credentials
+from bs4 import BeautifulSoup
+
+from http_client import get_cached
+from sheets import get_worksheet, report as sheets_report
+from sheet_table import SheetTable
+from sheet_io import SheetIO
+from profiling import profiled, tracer
+from browser_state import BrowserState
+from browser_profiles import launch_browser
 
 # =====================
 # Sheets設定
 # =====================
 
-SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
-
-SPREADSHEET_URL = os.environ["SPREADSHEET_URL"]
 TARGET_GID = int(os.environ.get("TARGET_GID", "0"))
 
-SERVICE_ACCOUNT_INFO = json.loads(
-    os.environ["GOOGLE_SERVICE_ACCOUNT_JSON"]
-)
+WRITE_EVERY = 20
 
 # =====================
-# 商品情報取得
+# 取得結果 -> 行データ
 # =====================
 
-async def fetch_product(product_code):
+def build_product(product_code, name, name_jp, info, img_url):
+
+    return {
+        "ID": product_code,
+        "NAME": name,
+        "NAME_JP": name_jp,
+        "BRAND": info.get("ブランド", ""),
+        "MODEL": info.get("モデル", ""),
+        "RELEASE": info.get("発売日", ""),
+        "PRICE": info.get("定価", ""),
+        "IMG": img_url or ""
+    }
+
+
+# =====================
+# 商品情報取得（HTTP + HTML パース）
+#  - ETag / Last-Modified 付きでキャッシュし、変更が無ければ 304
+#  - 商品名 / 画像が取れなければ None（ブラウザ取得にフォールバック）
+#    画像が空のまま書くと次回も対象になり、304 で同じ HTML が返り続ける
+# =====================
+
+def parse_product_html(product_code, html):
+
+    soup = BeautifulSoup(html, "html.parser")
+
+    h1 = soup.find("h1")
+
+    name = h1.get_text().strip() if h1 else ""
+
+    if not name:
+        return None
+
+    jp = soup.select_one("p.product-name-jp")
+
+    info = {}
+
+    for r in soup.select("table.product-detail-info-table tr"):
+
+        th = r.find("th")
+        td = r.find("td")
+
+        if th and td:
+            info[th.get_text().strip()] = td.get_text().strip()
+
+    img_url = None
+
+    for key in ("upload_bg_removed", "cdn.snkrdunk.com"):
+
+        img = soup.select_one(f'img[src*="{key}"]')
+
+        if img:
+
+            img_url = img.get("src")
+            break
+
+    if not img_url:
+        return None
+
+    return build_product(
+        product_code,
+        name,
+        jp.get_text().strip() if jp else "",
+        info,
+        img_url
+    )
+
+
+def fetch_product_http(product_code):
 
     url = f"https://snkrdunk.com/products/{product_code}"
 
+    status, html, cached = get_cached(
+        url,
+        headers={
+            "Accept": "text/html",
+            "Accept-Language": "ja",
+        }
+    )
+
+    if status != 200:
+        return None
+
+    res = parse_product_html(product_code, html)
+
+    if res:
+        print(f"[HTTP] {product_code}{' (304)' if cached else ''}")
+
+    return res
+
+
+async def fetch_product(product_code):
+
     try:
 
-        async with async_playwright() as p:
+        res = await asyncio.to_thread(fetch_product_http, product_code)
 
-            browser = await p.chromium.launch(
-                headless=True,
-                args=["--no-sandbox", "--disable-dev-shm-usage"]
-            )
+    except Exception as e:
 
-            page = await browser.new_page()
+        print("[WARN] http fetch failed", product_code, e)
 
-            print(f"[ACCESS] {product_code}")
+        res = None
+
+    if res:
+        return res
+
+    return await fetch_product_browser(product_code)
+
+
+# =====================
+# 商品情報取得（ブラウザ）
+#  - ページ内の evaluate 1回で全項目をまとめて取り出す
+# =====================
+
+EXTRACT_JS = """
+() => {
+  const text = (el) => el ? el.textContent.trim() : "";
+  const info = {};
+  for (const tr of document.querySelectorAll("table.product-detail-info-table tr")) {
+    const th = tr.querySelector("th");
+    const td = tr.querySelector("td");
+    if (th && td) {
+      info[th.textContent.trim()] = td.textContent.trim();
+    }
+  }
+  const img = document.querySelector('img[src*="upload_bg_removed"]')
+    || document.querySelector('img[src*="cdn.snkrdunk.com"]');
+  return {
+    name: text(document.querySelector("h1")),
+    name_jp: text(document.querySelector("p.product-name-jp")),
+    info,
+    img: img ? img.getAttribute("src") : "",
+  };
+}
+"""
+
+
+async def extract_product(page, product_code):
+
+    d = await page.evaluate(EXTRACT_JS)
+
+    return build_product(
+        product_code,
+        d["name"],
+        d["name_jp"],
+        d["info"],
+        d["img"]
+    )
+
+
+_browser_state = None
+
+
+def browser_state() -> BrowserState:
+
+    global _browser_state
+
+    if _browser_state is None:
+        _browser_state = BrowserState("snkrdunk")
 
-            await page.goto(url, timeout=90000)
-            await page.wait_for_load_state("networkidle")
+    return _browser_state
 
-            name = await page.text_content("h1")
 
-            name_jp = ""
-            jp = await page.query_selector("p.product-name-jp")
+async def fetch_product_browser(product_code):
 
-            if jp:
-                name_jp = (await jp.text_content()).strip()
+    url = f"https://snkrdunk.com/products/{product_code}"
 
-            info = {}
+    try:
 
-            rows = await page.query_selector_all(
-                "table.product-detail-info-table tr"
-            )
+        async with async_playwright() as p:
 
-            for r in rows:
+            browser = await launch_browser(p, "snkrdunk")
 
-                th = await r.query_selector("th")
-                td = await r.query_selector("td")
+            state = browser_state()
 
-                if th and td:
+            context = await browser.new_context(**state.context_options())
 
-                    k = (await th.text_content()).strip()
-                    v = (await td.text_content()).strip()
+            page = await context.new_page()
 
-                    info[k] = v
+            await tracer().start(context)
 
-            img_url = None
+            print(f"[ACCESS] {product_code}")
 
-            img = page.locator('img[src*="upload_bg_removed"]').first
+            async def load():
 
-            if await img.count() > 0:
-                img_url = await img.get_attribute("src")
+                await page.goto(url, timeout=90000)
+                await page.wait_for_load_state("networkidle")
 
-            if not img_url:
+                return await extract_product(page, product_code)
 
-                img = page.locator('img[src*="cdn.snkrdunk.com"]').first
+            res = await tracer().traced(page, product_code, load)
 
-                if await img.count() > 0:
-                    img_url = await img.get_attribute("src")
+            await state.save(context)
 
             await browser.close()
 
-            return {
-                "ID": product_code,
-                "NAME": name.strip() if name else "",
-                "NAME_JP": name_jp,
-                "BRAND": info.get("ブランド", ""),
-                "MODEL": info.get("モデル", ""),
-                "RELEASE": info.get("発売日", ""),
-                "PRICE": info.get("定価", ""),
-                "IMG": img_url or ""
-            }
+            return res
 
     except Exception as e:
 
@@ -106,25 +231,21 @@ async def fetch_product(product_code):
 # main
 # =====================
 
-async def main():
+def open_table():
+
+    return SheetTable(get_worksheet(TARGET_GID), [], key_columns=(0,))
 
-    creds = Credentials.from_service_account_info(
-        SERVICE_ACCOUNT_INFO,
-        scopes=SCOPES
-    )
 
-    gc = gspread.authorize(creds)
+async def main():
 
-    ws = gc.open_by_url(
-        SPREADSHEET_URL
-    ).get_worksheet_by_id(TARGET_GID)
+    io = SheetIO()
 
-    rows = ws.get_all_values()
+    table = await io.read(open_table)
 
     targets = []
     row_nums = []
 
-    for i, r in enumerate(rows[1:], start=2):
+    for i, r in sorted(table.rows.items()):
 
         code = r[0].strip() if len(r) > 0 else ""
         img = r[7].strip() if len(r) > 7 else ""
@@ -136,16 +257,22 @@ async def main():
 
     print("targets:", len(targets))
 
-    results = await asyncio.gather(
-        *[fetch_product(x) for x in targets]
-    )
+    async def fetch_row(row, code):
+        return row, await fetch_product(code)
+
+    done = 0
 
-    for row, res in zip(row_nums, results):
+    # 取得できた順に反映し、WRITE_EVERY 件ごとにバックグラウンドで書き込む
+    for fut in asyncio.as_completed(
+        [fetch_row(row, x) for row, x in zip(row_nums, targets)]
+    ):
+
+        row, res = await fut
 
         if not res:
             continue
 
-        ws.update(f"A{row}:G{row}", [[
+        table.set_cells(row, dict(enumerate([
 
             res["ID"],
             res["NAME"],
@@ -153,16 +280,30 @@ async def main():
             res["MODEL"],
             res["RELEASE"],
             res["PRICE"],
-            1
-
-        ]])
+            1,
+            res["IMG"],
+            res["NAME_JP"]
 
-        ws.update(f"H{row}", [[res["IMG"]]])
-        ws.update(f"I{row}", [[res["NAME_JP"]]])
+        ])))
 
         print("updated:", res["ID"])
 
+        done += 1
+
+        if done % WRITE_EVERY == 0:
+            io.write(table.write, *table.take_pending())
+
+    io.write(table.write, *table.take_pending())
+
+    cells = sum(await io.drain())
+
+    io.close()
+
+    print("cells written:", cells)
+
+    print(sheets_report())
+
 
 if __name__ == "__main__":
 
-    asyncio.run(main())
+    asyncio.run(profiled("snkrdunk_product", main()))
@@ -0,0 +1,163 @@
+# =========================================================
+# Mercari 共通処理（ブラウザ / Sheets に依存しない部分）
+#  - サイズ抽出・正規化、検索レスポンスからの候補抽出、URL 生成
+#  - ワーカープロセスやベンチマークから単体で import できる
+# =========================================================
+
+import re
+import json
+from urllib.parse import quote
+
+from bs4 import BeautifulSoup
+
+from models import Listing
+
+
+AFID = "4997609843"
+
+SITE_CODE = "メルカリ"
+
+HEADER = ["ID", "NAME", "SIZE", "SITE", "PRICE", "URL", "UPDATED"]
+
+
+# ===============================
+# サイズ抽出パターン
+# ===============================
+SIZE_PATTERNS = [
+    r"表記サイズ[：:\s]*([0-9]{2}\.?[0-9]?\s*cm)",
+    r"サイズ[：:\s]*([0-9]{2}\.?[0-9]?\s*cm)",
+    r"\b([0-9]{2}\.?[0-9]?)\s*cm\b",
+    r"\bUS\s*([0-9]{1,2}\.?[0-9]?)\b",
+]
+
+
+# ===============================
+# サイズ正規化
+# ===============================
+def normalize_size(size_str: str) -> str | None:
+    if not size_str:
+        return None
+
+    m = re.search(r"([0-9]{1,2}(?:\.[0-9])?)", size_str)
+    return m.group(1) if m else None
+
+
+# ===============================
+# APIレスポンスから候補抽出
+# ===============================
+def extract_item_candidates(data) -> list[Listing]:
+
+    items = []
+
+    if not isinstance(data, dict):
+        return items
+
+    for x in data.get("items", []):
+
+        try:
+
+            if int(x.get("itemConditionId", -1)) != 1:
+                continue
+
+            price = int(str(x.get("price")).replace(",", ""))
+
+            item_id = x.get("id") or x.get("itemId")
+
+            if not item_id:
+                continue
+
+            items.append(Listing(item_id, price))
+
+        except Exception:
+            continue
+
+    return items
+
+
+# ===============================
+# URL
+# ===============================
+def item_url(item_id: str) -> str:
+
+    return f"https://jp.mercari.com/item/{item_id}?afid={AFID}"
+
+
+def build_search_url(keyword: str) -> str:
+
+    return (
+        "https://jp.mercari.com/search"
+        f"?keyword={quote(keyword)}"
+        "&status=on_sale"
+    )
+
+
+# ===============================
+# 商品ページの HTML からサイズ取得（parse_pool のワーカーで実行）
+#  - __NEXT_DATA__ の itemSize → 無ければ本文を SIZE_PATTERNS で検索
+# ===============================
+NEXT_DATA = re.compile(r'<script id="__NEXT_DATA__".*?>(.*?)</script>', re.S)
+
+
+def size_from_item_html(html) -> str | None:
+
+    if isinstance(html, bytes):
+        html = html.decode("utf-8", "replace")
+
+    size = None
+
+    m = NEXT_DATA.search(html)
+
+    if m:
+
+        try:
+
+            j = json.loads(m.group(1))
+
+            size = (
+                j.get("props", {})
+                 .get("pageProps", {})
+                 .get("item", {})
+                 .get("item", {})
+                 .get("itemSize", {})
+                 .get("name")
+            )
+
+        except Exception:
+            pass
+
+    if not size:
+
+        text = BeautifulSoup(html, "html.parser").get_text("\n", strip=True)
+
+        for pat in SIZE_PATTERNS:
+
+            m = re.search(pat, text, re.IGNORECASE)
+
+            if m:
+
+                size = m.group(1).strip()
+                break
+
+    return normalize_size(size)
+
+
+# ===============================
+# 商品 API の JSON からサイズ取得
+# ===============================
+def size_from_api(info: dict) -> str | None:
+
+    size = info.get("size")
+
+    if not size:
+
+        for pat in SIZE_PATTERNS:
+
+            m = re.search(pat, info.get("text", ""), re.IGNORECASE)
+
+            if m:
+
+                size = m.group(1).strip()
+                break
+
+
+    return normalize_size(size)
@@ -0,0 +1,150 @@
+# =========================================================
+# Mercari 商品 API でのサイズ取得
+#  - 商品ページを開かず api.mercari.jp/items/get の JSON だけ取得
+#  - DPoP トークンはブラウザ内の WebCrypto で生成（鍵はセッションで1つ）
+#  - jp.mercari.com 上の1ページから fetch するので Cookie 等も共有
+#  - 複数IDを1回の evaluate でまとめて問い合わせ
+# =========================================================
+
+import os
+
+from playwright.async_api import BrowserContext
+
+from api_switch import ApiSwitch
+
+
+ITEM_API = "https://api.mercari.jp/items/get"
+
+ORIGIN_URL = "https://jp.mercari.com/"
+
+API_BATCH_SIZE = int(os.environ.get("MERCARI_API_BATCH", 10))
+
+
+RESOLVE_JS = """
+async ({api, ids}) => {
+
+  if (!window.__snkrDpopKey) {
+    window.__snkrDpopKey = await crypto.subtle.generateKey(
+      {name: "ECDSA", namedCurve: "P-256"}, true, ["sign", "verify"]
+    );
+    window.__snkrDpopJwk = await crypto.subtle.exportKey(
+      "jwk", window.__snkrDpopKey.publicKey
+    );
+  }
+
+  const b64 = (bytes) => btoa(String.fromCharCode(...new Uint8Array(bytes)))
+    .replace(/=+$/, "").replace(/\\+/g, "-").replace(/\\//g, "_");
+
+  const enc = (obj) => b64(new TextEncoder().encode(JSON.stringify(obj)));
+
+  const dpop = async () => {
+    const {crv, kty, x, y} = window.__snkrDpopJwk;
+    const input = enc({typ: "dpop+jwt", alg: "ES256", jwk: {crv, kty, x, y}})
+      + "." + enc({
+        iat: Math.floor(Date.now() / 1000),
+        jti: crypto.randomUUID(),
+        htu: api,
+        htm: "GET",
+        uuid: crypto.randomUUID(),
+      });
+    const sig = await crypto.subtle.sign(
+      {name: "ECDSA", hash: "SHA-256"},
+      window.__snkrDpopKey.privateKey,
+      new TextEncoder().encode(input)
+    );
+    return input + "." + b64(sig);
+  };
+
+  return await Promise.all(ids.map(async (id) => {
+    try {
+      const r = await fetch(`${api}?id=${encodeURIComponent(id)}`, {
+        headers: {
+          "DPoP": await dpop(),
+          "X-Platform": "web",
+          "Accept": "application/json",
+        },
+      });
+      if (!r.ok) {
+        return {id, status: r.status};
+      }
+      const d = (await r.json()).data || {};
+      const size = d.item_size || d.itemSize || {};
+      return {
+        id,
+        status: r.status,
+        size: size.name || null,
+        text: [d.name || "", d.description || ""].join("\\n"),
+      };
+    } catch (e) {
+      return {id, status: 0};
+    }
+  }));
+}
+"""
+
+
+class MercariItemResolver:
+
+    def __init__(self, context: BrowserContext):
+
+        self.context = context
+        self.page = None
+        self.api = ApiSwitch("item api", "MERCARI_ITEM_API", "item pages")
+
+    @property
+    def enabled(self) -> bool:
+        return self.api.enabled
+
+    async def start(self):
+
+        if not self.enabled:
+            return
+
+        try:
+
+            self.page = await self.context.new_page()
+
+            await self.page.goto(
+                ORIGIN_URL,
+                wait_until="domcontentloaded",
+                timeout=120_000
+            )
+
+        except Exception as e:
+
+            self.api.disable(e)
+
+    # ===============================
+    # 一括取得
+    #  - 戻り値: {id: {"size": ..., "text": ...}}
+    #  - 失敗したIDは含めない（呼び出し側でページ表示にフォールバック）
+    # ===============================
+    async def resolve_many(self, ids) -> dict:
+
+        if not self.enabled or not ids:
+            return {}
+
+        try:
+
+            results = await self.page.evaluate(
+                RESOLVE_JS,
+                {"api": ITEM_API, "ids": list(ids)}
+            )
+
+        except Exception as e:
+
+            print(f"[WARN] item api evaluate failed: {e}")
+
+            results = []
+
+        ok = {
+            r["id"]: r for r in results
+            if r.get("status") == 200
+        }
+
+        if ok:
+            self.api.ok()
+        else:
+            self.api.failed()
+
+        return ok
@@ -0,0 +1,707 @@
+# =========================================================
+# Mercari Scraper 本体（mercari*_main.py から呼び出し）
+#  - 新品・未使用
+#  - 販売中のみ（URLで status=on_sale）
+#  - size は数値のみで出力
+#  - URL に afid を付与
+#  - ID+SIZE単位で上書き
+#  - 取得できなかったサイズは price=0 で上書き
+#  - 結果は store（SQLite）に書き、最後に変更行だけシートへ同期
+# =========================================================
+
+import os
+import json
+import asyncio
+from datetime import datetime
+from functools import partial
+
+from playwright.async_api import async_playwright, Page
+
+from mercari_common import (
+    SITE_CODE,
+    HEADER,
+    extract_item_candidates,
+    build_search_url,
+    size_from_api,
+    size_from_item_html,
+)
+from sheets import get_worksheet, report as sheets_report
+from price_history import PriceHistory
+from aggregate import CandidateFrame, build_output
+from sheet_table import SheetTable
+from mercari_item_api import MercariItemResolver, API_BATCH_SIZE
+from mercari_search_api import MercariSearchClient
+from sharding import run_sharded, auto_worker_count
+from sheet_io import SheetIO
+from single_flight import SingleFlight
+from negative_cache import NegativeCache
+from browser_watchdog import MemoryWatchdog
+from circuit_breaker import CircuitBreaker, SiteDown
+from profiling import tracer
+from parse_pool import parse_pool
+from browser_state import BrowserState
+from browser_profiles import launch_browser
+from models import Candidate, OutputRow
+from store import Store
+from sheet_sync import sync, SHEET_SYNC
+
+
+# ===============================
+# 環境変数
+# ===============================
+INPUT_GID = int(os.environ.get("INPUT_GID", 0))
+OUTPUT_GID = int(os.environ.get("OUTPUT_GID", 208209208))
+
+DETAIL_WORKERS = int(os.environ.get("DETAIL_WORKERS", 3))
+
+
+# ===============================
+# 商品ページからサイズ取得（API で取れなかった時のみ）
+#  - 表示に失敗した時は例外（一時的な失敗としてキャッシュしない）
+# ===============================
+async def resolve_item_size(page: Page, item_id: str) -> str | None:
+
+    base_url = f"https://jp.mercari.com/item/{item_id}"
+
+    await page.goto(
+        base_url,
+        wait_until="domcontentloaded",
+        timeout=120_000
+    )
+
+    await page.wait_for_timeout(1500)
+
+
+    html = await page.content()
+
+    # パースはイベントループの外で
+    return await parse_pool().run(size_from_item_html, html)
+
+
+# ===============================
+# 複数商品のサイズ取得（API → 失敗分だけ商品ページ）
+#  - 開けたのにサイズが決まらない商品は negative に記録
+#  - 商品ページの成否は breaker に記録（止まっている間は待つ）
+# ===============================
+async def resolve_sizes(
+    item_ids: list,
+    page: Page,
+    resolver: MercariItemResolver,
+    negative: NegativeCache,
+    breaker: CircuitBreaker
+) -> dict:
+
+    infos = await resolver.resolve_many(item_ids)
+
+    sizes = {}
+
+
+    for item_id in item_ids:
+
+        try:
+
+            if item_id in infos:
+
+                size = size_from_api(infos[item_id])
+                reason = "api_no_size"
+
+            else:
+
+                token = await breaker.acquire()
+
+                try:
+                    size = await tracer().traced(
+                        page,
+                        item_id,
+                        lambda: resolve_item_size(page, item_id)
+                    )
+                except Exception:
+                    breaker.record(False, token)
+                    raise
+
+                breaker.record(True, token)
+                reason = "page_no_size"
+
+        except SiteDown:
+            raise
+
+        except Exception:
+
+            sizes[item_id] = None
+            continue
+
+
+        if not size:
+            negative.add(SITE_CODE, item_id, reason)
+
+        sizes[item_id] = size
+
+
+    return sizes
+
+
+# ===============================
+# サイズ候補取得（最安の判定は集計側で行う）
+#  - 検索は API（ブラウザなし）、使えない時だけ検索ページをスクロール
+#  - 検索結果を受け取った時点で価格順キューへ投入
+#  - 検索中から detail_pages のワーカーが安い順に処理
+#  - サイズはまず商品 API でまとめて取得、失敗分だけ商品ページを開く
+#  - 同じ商品は items（実行単位の single-flight）で1回だけ取得
+#  - negative に載っている商品はキューに入れない
+#  - サイトが落ちたまま（SiteDown）なら途中結果は捨てて例外を上げる
+# ===============================
+async def fetch_size_candidates(
+    page: Page,
+    keyword: str,
+    detail_pages: list,
+    resolver: MercariItemResolver,
+    items: SingleFlight,
+    negative: NegativeCache,
+    breaker: CircuitBreaker,
+    search_client: MercariSearchClient
+):
+
+    queue = asyncio.PriorityQueue()
+
+    seen = set()
+
+    handlers = set()
+
+    found = []
+
+
+    async def handle_response(response):
+
+        try:
+
+            if "application/json" not in response.headers.get("content-type", ""):
+                return
+
+            if "search" not in response.url:
+                return
+
+            data = json.loads(await response.text())
+
+            push(extract_item_candidates(data))
+
+        except Exception:
+            pass
+
+
+    def push(candidates):
+
+        for x in candidates:
+
+            if x.item_id in seen:
+                continue
+
+            seen.add(x.item_id)
+
+            if negative.check(SITE_CODE, x.item_id):
+                continue
+
+            queue.put_nowait((x.price, x.item_id))
+
+
+    def on_response(response):
+
+        task = asyncio.create_task(handle_response(response))
+
+        handlers.add(task)
+
+        task.add_done_callback(handlers.discard)
+
+
+    async def search():
+
+        try:
+
+            # 検索 API（ブラウザなし）→ 使えなければ検索ページをスクロール
+            #  - breaker はリクエストごとに1回だけ取り、必ず record / release する
+            #    （half-open の試行枠を取ったまま scroll() で待たない）
+            #  - こちら側の失敗（署名・リクエスト不正など）はサイトの不調に数えない
+            candidates = None
+
+            if search_client.enabled:
+
+                token = await breaker.acquire()
+
+                try:
+                    candidates = await search_client.search(keyword)
+
+                except BaseException:
+
+                    breaker.release(token)
+                    raise
+
+                if candidates is not None:
+                    breaker.record(True, token)
+
+                elif search_client.site_down:
+                    breaker.record(False, token)
+
+                else:
+                    breaker.release(token)
+
+            if candidates is not None:
+
+                push(candidates)
+
+            else:
+                await scroll()
+
+        finally:
+
+            # 終了の目印（価格 inf なので実データより後に取り出される）
+            for _ in detail_pages:
+                queue.put_nowait((float("inf"), ""))
+
+
+    async def scroll():
+
+        page.on("response", on_response)
+
+        try:
+
+            token = await breaker.acquire()
+
+            try:
+
+                await page.goto(
+                    build_search_url(keyword),
+                    wait_until="domcontentloaded",
+                    timeout=120_000
+                )
+
+            except Exception:
+
+                breaker.record(False, token)
+                raise
+
+            breaker.record(True, token)
+
+
+            for _ in range(5):
+
+                await page.mouse.wheel(0, 3000)
+                await page.wait_for_timeout(1200)
+
+        except SiteDown:
+            raise
+
+        except Exception as e:
+
+            print(f"[WARN] search failed: {keyword} {e}")
+
+        finally:
+
+            page.remove_listener("response", on_response)
+
+            if handlers:
+                await asyncio.gather(*handlers, return_exceptions=True)
+
+
+    async def resolve_keys(keys, detail_page):
+
+        sizes = await resolve_sizes(
+            [i for _, i in keys],
+            detail_page,
+            resolver,
+            negative,
+            breaker
+        )
+
+        return {(SITE_CODE, i): v for i, v in sizes.items()}
+
+
+    async def worker(detail_page: Page):
+
+        done = False
+
+        while not done:
+
+            price, item_id = await queue.get()
+
+            batch = []
+
+            while item_id:
+
+                batch.append((price, item_id))
+
+                if len(batch) >= API_BATCH_SIZE or queue.empty():
+                    break
+
+                price, item_id = queue.get_nowait()
+
+            done = not item_id
+
+
+            sizes = await items.do_many(
+                [(SITE_CODE, i) for _, i in batch],
+                lambda keys: resolve_keys(keys, detail_page)
+            )
+
+
+            for price, item_id in batch:
+
+                size = sizes.get((SITE_CODE, item_id))
+
+                if not size:
+                    continue
+
+                found.append(Candidate(SITE_CODE, item_id, price, size))
+
+
+    # SiteDown のワーカーがあっても他のワーカーの終了を待ってから上げる
+    outcomes = await asyncio.gather(
+        search(),
+        *[worker(p) for p in detail_pages],
+        return_exceptions=True
+    )
+
+    for e in outcomes:
+
+        if isinstance(e, BaseException):
+            raise e
+
+
+    return found
+
+
+# ===============================
+# ブラウザコンテキストの用意（作り直し時も同じ設定）
+#  - 検索ページ / 詳細ページ / 商品 API 用ページをまとめて作る
+#  - 検索レスポンスの受信は fetch_size_candidates で毎回登録する
+#  - トレース取得時は詳細ページごとに別コンテキスト（チャンクが重ならない）
+# ===============================
+async def new_context(browser, block_assets: bool, state: BrowserState):
+
+    context = await browser.new_context(**state.context_options())
+
+    if block_assets:
+
+        # ===============================
+        # 画像・CSS・フォント停止（高速化）
+        # ===============================
+        await context.route(
+            "**/*",
+            lambda route: route.abort()
+            if route.request.resource_type in ["image", "stylesheet", "font"]
+            else route.continue_()
+        )
+
+    return context
+
+
+async def open_session(
+    browser,
+    block_assets: bool,
+    watchdog: MemoryWatchdog,
+    state: BrowserState
+):
+
+    context = await new_context(browser, block_assets, state)
+
+    page = await context.new_page()
+
+    detail_pages = []
+
+    for _ in range(DETAIL_WORKERS):
+
+        if tracer().enabled:
+
+            detail_context = await new_context(browser, block_assets, state)
+
+            await tracer().start(detail_context)
+
+            detail_pages.append(await detail_context.new_page())
+
+        else:
+            detail_pages.append(await context.new_page())
+
+    for pg in [page] + detail_pages:
+        watchdog.watch(pg)
+
+    resolver = MercariItemResolver(context)
+
+    await resolver.start()
+
+    return context, page, detail_pages, resolver
+
+
+# ===============================
+# 対象リストの取得（1プロセス分）
+#  - メモリ / ナビゲーション数が上限を超えたら対象の切れ目で
+#    コンテキストを作り直す
+# ===============================
+async def scrape_targets(targets: list, block_assets: bool = False) -> list:
+
+    results = []
+
+    watchdog = MemoryWatchdog()
+
+
+    async with async_playwright() as p:
+
+        browser = await launch_browser(p, "mercari")
+
+        # 前回の Cookie / localStorage を引き継ぐ
+        state = BrowserState("mercari")
+
+        context, page, detail_pages, resolver = await open_session(
+            browser,
+            block_assets,
+            watchdog,
+            state
+        )
+
+
+        # 実行単位の重複排除（商品 / 同じキーワードの検索）
+        items = SingleFlight("items")
+
+        searches = SingleFlight("searches")
+
+        negative = NegativeCache()
+
+        breaker = CircuitBreaker(SITE_CODE)
+
+        search_client = MercariSearchClient()
+
+
+        for r in targets:
+
+            id_str = str(r["ID"])
+            name = r["NAME"]
+
+            watchdog.sample(id_str)
+
+            if watchdog.should_recycle():
+
+                print(f"[INFO] recycle browser context navs={watchdog.navigations}")
+
+                # 作り直す前に最新の Cookie を保存して新しいコンテキストへ
+                await state.save(context)
+
+                for c in {context} | {pg.context for pg in detail_pages}:
+                    await c.close()
+
+                context, page, detail_pages, resolver = await open_session(
+                    browser,
+                    block_assets,
+                    watchdog,
+                    state
+                )
+
+                watchdog.recycled()
+
+            print(f"[START] {id_str} / {name}")
+
+
+            try:
+
+                found = await searches.do(
+                    name,
+                    lambda: fetch_size_candidates(
+                        page,
+                        name,
+                        detail_pages,
+                        resolver,
+                        items,
+                        negative,
+                        breaker,
+                        search_client
+                    )
+                )
+
+            except SiteDown:
+
+                # 終わった対象だけ返して書き込ませる
+                print(f"[WARN] {SITE_CODE} down, stop at {id_str} ({len(results)}/{len(targets)} done)")
+                break
+
+
+            print(f"[INFO] size_count={len({v.size for v in found})}")
+
+
+            results.append((id_str, name, found))
+
+
+        watchdog.sample("end")
+
+        # ブロックされたままの Cookie は次回に持ち越さない
+        if breaker.down:
+            state.invalidate("(site down)")
+        else:
+            await state.save(context)
+
+        await browser.close()
+
+
+    print(items.summary())
+    print(searches.summary())
+    print(negative.report())
+    print(watchdog.summary())
+    print(breaker.summary())
+
+    parse_pool().shutdown()
+
+    negative.save()
+
+    watchdog.save()
+
+
+    return results
+
+
+# ===============================
+# シート読み込み（SheetIO のスレッドで実行）
+# ===============================
+def load_targets(update: str) -> list:
+
+    rows = get_worksheet(INPUT_GID).get_all_records()
+
+    return [
+        r for r in rows
+        if str(r.get("update", "")).strip() == update
+    ]
+
+
+def load_output_table() -> SheetTable:
+
+    return SheetTable(get_worksheet(OUTPUT_GID), HEADER)
+
+
+# ===============================
+# メイン
+#  - update: 入力シートの update 列がこの値の行だけ処理
+#  - block_assets: 画像・CSS・フォントを読み込まない
+# ===============================
+async def run(update: str, block_assets: bool = False):
+
+    started = datetime.now()
+
+    now = started.strftime("%Y-%m-%d %H:%M:%S")
+
+
+    io = SheetIO()
+
+    store = Store()
+
+
+    # ===============================
+    # シート読み込み（専用スレッドで先読み）
+    #  - 出力シートは store に取り込んでいない時だけ読む（スクレイピングと並行）
+    # ===============================
+    targets_future = io.read(load_targets, update)
+
+    table_future = None if store.imported(SITE_CODE) else io.read(load_output_table)
+
+
+    targets = await targets_future
+
+
+    print(f"[INFO] update={update} targets: {len(targets)}")
+
+
+    names = {}
+
+    frame = CandidateFrame()
+
+    observations = []
+
+
+    # ===============================
+    # 集計（ID,SIZE単位で最安 / 取得できなかったサイズは price=0）
+    #  - シャードが終わるたびに store へ反映（シートへは最後に同期）
+    # ===============================
+    async def apply_results(results):
+
+        nonlocal table_future
+
+        if table_future is not None:
+
+            store.import_table(await table_future, SITE_CODE)
+
+            table_future = None
+
+        shard_ids = []
+
+
+        with store.transaction():
+
+            for id_str, name, found in results:
+
+                names[id_str] = name
+
+                shard_ids.append(id_str)
+
+                frame.extend(id_str, found)
+
+                store.add_listings(id_str, found, now)
+
+
+            for id_str, size, v in build_output(
+                frame.cheapest(),
+                store.sizes,
+                shard_ids,
+                SITE_CODE
+            ):
+
+                if v is None:
+
+                    store.set_price(id_str, size, SITE_CODE, 0, now)
+
+                    continue
+
+
+                store.upsert(
+                    OutputRow.from_candidate(id_str, names[id_str], v, now)
+                )
+
+
+                observations.append((
+                    started,
+                    id_str,
+                    size,
+                    SITE_CODE,
+                    v.price,
+                    v.item_id,
+                ))
+
+
+    # ===============================
+    # 取得（SCRAPER_WORKERS 個のプロセスに分割）
+    # ===============================
+    await run_sharded(
+        partial(scrape_targets, block_assets=block_assets),
+        targets,
+        auto_worker_count(len(targets)),
+        apply_results
+    )
+
+
+    # ===============================
+    # 価格履歴へ追記
+    #  - store と同じく同期の前に（シートの失敗で履歴を失わない）
+    # ===============================
+    appended = PriceHistory().append(observations)
+
+    print(f"[INFO] history appended={appended}")
+
+
+    # ===============================
+    # シートへ同期（変更のあった行だけ）
+    # ===============================
+    if SHEET_SYNC:
+        io.write(sync, SITE_CODE, load_output_table, store.path)
+
+    cells = sum(await io.drain())
+
+    io.close()
+
+
+    print(f"[DONE] total rows={store.count(SITE_CODE)} cells written={cells}")
+
+    store.close()
+
+    print(sheets_report())
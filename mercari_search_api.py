@@ -0,0 +1,240 @@
+# =========================================================
+# Mercari 検索 API（ブラウザなし）
+#  - api.mercari.jp/v2/entities:search に共有 HTTP クライアントで POST
+#  - DPoP トークン（ES256）は Python 側で生成（鍵はプロセスで1つ）
+#  - 価格の安い順・新品のみ・販売中、1ページ SEARCH_PAGE_SIZE 件
+#  - 戻り値は extract_item_candidates() と同じ Listing のリスト
+#  - 失敗が続いたら無効化し、呼び出し側は検索ページのスクロールに戻す
+#  - site_down: 直前の失敗がサイト側（タイムアウト / 403 / 429 / 5xx）か
+# =========================================================
+
+import os
+import json
+import time
+import uuid
+import base64
+import asyncio
+
+import requests
+
+from api_switch import ApiSwitch
+from http_client import get_session
+from mercari_common import extract_item_candidates
+from circuit_breaker import is_site_down_status
+
+
+SEARCH_API = "https://api.mercari.jp/v2/entities:search"
+
+SEARCH_PAGE_SIZE = int(os.environ.get("MERCARI_SEARCH_PAGE_SIZE", 120))
+
+SEARCH_PAGES = int(os.environ.get("MERCARI_SEARCH_PAGES", 1))
+
+
+class SearchApiError(Exception):
+
+    def __init__(self, status: int):
+
+        super().__init__(f"status {status}")
+
+        self.status = status
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _enc(obj) -> str:
+    return _b64(json.dumps(obj, separators=(",", ":")).encode())
+
+
+# ===============================
+# DPoP トークン
+# ===============================
+class DPoPSigner:
+
+    def __init__(self):
+
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import ec
+        from cryptography.hazmat.primitives.asymmetric.utils import (
+            decode_dss_signature,
+        )
+
+        self._ec = ec
+        self._hashes = hashes
+        self._decode = decode_dss_signature
+
+        self.key = ec.generate_private_key(ec.SECP256R1())
+
+        pub = self.key.public_key().public_numbers()
+
+        self.jwk = {
+            "crv": "P-256",
+            "kty": "EC",
+            "x": _b64(pub.x.to_bytes(32, "big")),
+            "y": _b64(pub.y.to_bytes(32, "big")),
+        }
+
+    def token(self, url: str, method: str) -> str:
+
+        signing_input = _enc({
+            "typ": "dpop+jwt",
+            "alg": "ES256",
+            "jwk": self.jwk,
+        }) + "." + _enc({
+            "iat": int(time.time()),
+            "jti": str(uuid.uuid4()),
+            "htu": url,
+            "htm": method,
+            "uuid": str(uuid.uuid4()),
+        })
+
+        der = self.key.sign(
+            signing_input.encode(),
+            self._ec.ECDSA(self._hashes.SHA256())
+        )
+
+        # JWS の ES256 は DER ではなく r||s（各32バイト）
+        r, s = self._decode(der)
+
+        return signing_input + "." + _b64(
+            r.to_bytes(32, "big") + s.to_bytes(32, "big")
+        )
+
+
+def build_search_body(keyword: str, page_token: str = "", page_size: int = SEARCH_PAGE_SIZE) -> dict:
+
+    return {
+        "userId": "",
+        "pageSize": page_size,
+        "pageToken": page_token,
+        "searchSessionId": uuid.uuid4().hex,
+        "indexRouting": "INDEX_ROUTING_UNSPECIFIED",
+        "thumbnailTypes": [],
+        "searchCondition": {
+            "keyword": keyword,
+            "excludeKeyword": "",
+            "sort": "SORT_PRICE",
+            "order": "ORDER_ASC",
+            "status": ["STATUS_ON_SALE"],
+            "sizeId": [],
+            "categoryId": [],
+            "brandId": [],
+            "sellerId": [],
+            "priceMin": 0,
+            "priceMax": 0,
+            "itemConditionId": [1],
+            "shippingPayerId": [],
+            "shippingFromArea": [],
+            "shippingMethod": [],
+            "colorId": [],
+            "hasCoupon": False,
+            "attributes": [],
+            "itemTypes": [],
+            "skuIds": [],
+        },
+        "defaultDatasets": ["DATASET_TYPE_MERCARI", "DATASET_TYPE_BEYOND"],
+        "serviceFrom": "suruga",
+        "withItemBrand": False,
+        "withItemSize": False,
+        "withItemPromotions": False,
+        "withItemSizes": False,
+        "withShopname": False,
+    }
+
+
+class MercariSearchClient:
+
+    def __init__(self):
+
+        self.api = ApiSwitch("search api", "MERCARI_SEARCH_API", "search page")
+        self.signer = None
+        self.site_down = False
+
+        if self.enabled:
+
+            try:
+                self.signer = DPoPSigner()
+
+            except ImportError as e:
+                self.api.disable(e)
+
+    @property
+    def enabled(self) -> bool:
+        return self.api.enabled
+
+    def _post(self, body: dict) -> dict:
+
+        r = get_session().post(
+            SEARCH_API,
+            json=body,
+            headers={
+                "DPoP": self.signer.token(SEARCH_API, "POST"),
+                "X-Platform": "web",
+                "X-Country-Code": "JP",
+                "Accept": "application/json",
+                "Content-Type": "application/json",
+                "Origin": "https://jp.mercari.com",
+                "Referer": "https://jp.mercari.com/",
+            },
+            timeout=20
+        )
+
+        if r.status_code != 200:
+            raise SearchApiError(r.status_code)
+
+        return r.json()
+
+    def _search(self, keyword: str) -> list:
+
+        out = []
+
+        token = ""
+
+        for _ in range(SEARCH_PAGES):
+
+            data = self._post(build_search_body(keyword, token))
+
+            out.extend(extract_item_candidates(data))
+
+            token = (data.get("meta") or {}).get("nextPageToken") or ""
+
+            if not token:
+                break
+
+        return out
+
+    # ===============================
+    # 検索
+    #  - 戻り値: [Listing]（安い順）
+    #  - 失敗した時は None（呼び出し側で検索ページにフォールバック）
+    # ===============================
+    async def search(self, keyword: str):
+
+        self.site_down = False
+
+        if not self.enabled:
+            return None
+
+        try:
+
+            found = await asyncio.to_thread(self._search, keyword)
+
+        except Exception as e:
+
+            print(f"[WARN] search api failed: {keyword} {e}")
+
+            if isinstance(e, SearchApiError):
+                self.site_down = is_site_down_status(e.status)
+            else:
+                self.site_down = isinstance(
+                    e, (requests.Timeout, requests.ConnectionError)
+                )
+
+            self.api.failed()
+
+            return None
+
+        self.api.ok()
+
+        return found
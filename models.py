@@ -0,0 +1,83 @@
+# =========================================================
+# スクレイパー共通のデータ型
+#  - Listing: 検索結果の1件（商品ID・価格）
+#  - Candidate: サイズが分かった候補（集計の単位）
+#  - OutputRow: 出力シートの1行（ID, NAME, size, site, price, url, updated）
+#  - __slots__ で1件あたりのメモリを抑え、site / size は intern して共有
+#  - URL は必要になった時に site ごとの関数で組み立てる
+# =========================================================
+
+import sys
+from dataclasses import dataclass
+
+
+ITEM_URLS = {}
+
+
+def item_url(site: str, item_id: str) -> str:
+
+    # *_common が Listing を import するので、こちらは使う時に import
+    if not ITEM_URLS:
+
+        import mercari_common
+        import yahoo_common
+
+        ITEM_URLS[mercari_common.SITE_CODE] = mercari_common.item_url
+        ITEM_URLS[yahoo_common.SITE_CODE] = yahoo_common.item_url
+
+    return ITEM_URLS[site](item_id)
+
+
+@dataclass(slots=True)
+class Listing:
+
+    item_id: str
+    price: int
+
+
+@dataclass(slots=True)
+class Candidate:
+
+    site: str
+    item_id: str
+    price: int
+    size: str
+
+    def __post_init__(self):
+
+        self.site = sys.intern(self.site)
+        self.size = sys.intern(str(self.size))
+        self.price = int(self.price)
+
+    @property
+    def url(self) -> str:
+        return item_url(self.site, self.item_id)
+
+
+@dataclass(slots=True)
+class OutputRow:
+
+    pid: str
+    name: str
+    size: str
+    site: str
+    price: int
+    url: str
+    updated: str
+
+    @classmethod
+    def from_candidate(cls, pid, name, c: Candidate, updated: str):
+        return cls(pid, name, c.size, c.site, c.price, c.url, updated)
+
+    # SheetTable.upsert() にそのまま渡せるよう列順で返す
+    def __iter__(self):
+
+        return iter((
+            self.pid,
+            self.name,
+            self.size,
+            self.site,
+            self.price,
+            self.url,
+            self.updated,
+        ))
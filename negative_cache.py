@@ -0,0 +1,143 @@
+# =========================================================
+# サイズが取れなかった商品のネガティブキャッシュ
+#  - アクセサリ・箱・まとめ売りなど、開いてもサイズが決まらない商品を記録
+#  - TTL 内は商品ページ / API を開く前にスキップ
+#  - ブロック・タイムアウトなど一時的な失敗は記録しない
+#  - 複数プロセスから保存しても消えないよう、保存時にファイルとマージ
+# =========================================================
+
+import os
+import json
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+NEGATIVE_CACHE_PATH = os.environ.get(
+    "NEGATIVE_CACHE_PATH",
+    "cache/negative_items.json"
+)
+
+NEGATIVE_CACHE_TTL_HOURS = float(
+    os.environ.get("NEGATIVE_CACHE_TTL_HOURS", 72)
+)
+
+
+def _load(path) -> dict:
+
+    try:
+
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    except (OSError, ValueError):
+        return {}
+
+
+class NegativeCache:
+
+    def __init__(
+        self,
+        path: str = NEGATIVE_CACHE_PATH,
+        ttl_hours: float = NEGATIVE_CACHE_TTL_HOURS
+    ):
+
+        self.path = path
+        self.ttl = ttl_hours * 3600
+
+        now = time.time()
+
+        stored = _load(path)
+
+        self.entries = {
+            k: v for k, v in stored.items()
+            if now - v.get("ts", 0) < self.ttl
+        }
+
+        self.expired = len(stored) - len(self.entries)
+
+        self.added = 0
+
+        self._added = {}
+
+        self.skipped = {}
+
+    @staticmethod
+    def key(site, item_id) -> str:
+        return f"{site}:{item_id}"
+
+    def __len__(self):
+        return len(self.entries)
+
+    # ===============================
+    # 参照（ヒットしたら skip 件数を理由別に数える）
+    # ===============================
+    def check(self, site, item_id):
+
+        entry = self.entries.get(self.key(site, item_id))
+
+        if not entry:
+            return None
+
+        reason = entry.get("reason", "")
+
+        self.skipped[reason] = self.skipped.get(reason, 0) + 1
+
+        return reason
+
+    def add(self, site, item_id, reason: str):
+
+        entry = {"reason": reason, "ts": int(time.time())}
+
+        self.entries[self.key(site, item_id)] = entry
+        self._added[self.key(site, item_id)] = entry
+
+        self.added += 1
+
+    # ===============================
+    # 保存（他プロセスの追加分とマージ）
+    # ===============================
+    def save(self):
+
+        if not self._added:
+            return
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+        with open(self.path + ".lock", "w") as lock:
+
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+
+            now = time.time()
+
+            merged = {
+                k: v for k, v in _load(self.path).items()
+                if now - v.get("ts", 0) < self.ttl
+            }
+
+            merged.update(self._added)
+
+            tmp = self.path + ".tmp"
+
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(merged, f, ensure_ascii=False)
+
+            os.replace(tmp, self.path)
+
+        self._added = {}
+
+    def report(self) -> str:
+
+        skipped = sum(self.skipped.values())
+
+        detail = " ".join(f"{k}={v}" for k, v in sorted(self.skipped.items()))
+
+        return (
+            f"[INFO] negative cache: skipped visits={skipped} ({detail}) "
+            f"added={self.added} entries={len(self.entries)} "
+            f"expired={self.expired}"
+        )
@@ -0,0 +1,103 @@
+# =========================================================
+# HTML パース用のワーカープール
+#  - BeautifulSoup / 正規表現は 500KB〜1MB のページで数十 ms かかるので
+#    イベントループのスレッドでは実行しない
+#  - PARSE_POOL=process（既定）: 別プロセスで並列（GIL を回避）
+#    PARSE_POOL=thread: スレッド（起動が軽い / 子プロセスを増やしたくない時）
+#    PARSE_POOL=inline: 呼び出し元でそのまま実行（比較・デバッグ用）
+#  - 渡す関数はモジュールのトップレベル関数（プロセスに送るため）
+# =========================================================
+
+import os
+import asyncio
+import multiprocessing
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+PARSE_POOL = os.environ.get("PARSE_POOL", "process").strip().lower()
+
+PARSE_WORKERS = int(
+    os.environ.get("PARSE_WORKERS", max(1, (os.cpu_count() or 2) // 2))
+)
+
+
+class ParsePool:
+
+    def __init__(self, kind: str = PARSE_POOL, workers: int = PARSE_WORKERS):
+
+        self.kind = kind
+        self.workers = workers
+
+        self.calls = 0
+
+        self._executor = None
+
+    def _get_executor(self):
+
+        if self._executor is None:
+
+            if self.kind == "process":
+
+                # sharding と同じく spawn（親のスレッドを fork で持ち込まない）
+                self._executor = ProcessPoolExecutor(
+                    self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+
+            else:
+
+                self._executor = ThreadPoolExecutor(
+                    self.workers,
+                    thread_name_prefix="parse"
+                )
+
+        return self._executor
+
+    async def run(self, fn, *args):
+
+        self.calls += 1
+
+        if self.kind == "inline":
+            return fn(*args)
+
+        loop = asyncio.get_running_loop()
+
+        try:
+
+            return await loop.run_in_executor(
+                self._get_executor(),
+                partial(fn, *args)
+            )
+
+        except BrokenProcessPool:
+
+            # ワーカーが落ちたらスレッドに切り替えて続ける
+            print("[WARN] parse process pool broken, fallback to threads")
+
+            self.kind = "thread"
+            self._executor = None
+
+            return await self.run(fn, *args)
+
+    def shutdown(self):
+
+        if self._executor is not None:
+
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+            self._executor = None
+
+
+_pool = None
+
+
+def parse_pool() -> ParsePool:
+
+    global _pool
+
+    if _pool is None:
+        _pool = ParsePool()
+
+    return _pool
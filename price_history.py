@@ -0,0 +1,395 @@
+# =========================================================
+# 価格履歴ストア（列指向・追記専用）
+#  - 1観測 = (timestamp, ID, size, site, price, item_id)
+#  - 列ごとに array のバイナリファイルへ追記
+#  - ID / size / site / item_id は辞書エンコード（*.dict に追記）
+#  - 期間ごとの最安値 / 中央値を集計するクエリ付き
+#  - 途中で落ちた追記（列の長さ違い・辞書の途中行）は次の追記の前に切り詰める
+#  - scan / query はフィルタの列だけ読んで行を絞り、使う列だけ読む
+#
+#  python price_history.py <ID> [--size 27.5] [--site メルカリ] [--days 30] [--window 1d]
+# =========================================================
+
+import os
+import sys
+import time
+import argparse
+import statistics
+from array import array
+from datetime import datetime
+
+
+HISTORY_DIR = os.environ.get("PRICE_HISTORY_DIR", "price_history")
+
+# 列名 -> array typecode
+COLUMNS = {
+    "ts": "q",
+    "id": "I",
+    "size": "I",
+    "site": "I",
+    "price": "q",
+    "item": "I",
+}
+
+# 辞書エンコードする列
+DICT_COLUMNS = ("id", "size", "site", "item")
+
+WINDOW_UNITS = {"m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def parse_window(window) -> int:
+
+    if isinstance(window, (int, float)):
+        return int(window)
+
+    window = str(window).strip().lower()
+
+    if window[-1:] in WINDOW_UNITS:
+        return int(float(window[:-1]) * WINDOW_UNITS[window[-1]])
+
+    return int(window)
+
+
+class PriceHistory:
+
+    def __init__(self, path: str = HISTORY_DIR):
+
+        self.path = path
+
+        os.makedirs(path, exist_ok=True)
+
+        self._values = {c: [] for c in DICT_COLUMNS}
+        self._codes = {c: {} for c in DICT_COLUMNS}
+
+        # 改行で終わっていない最終行（書きかけ）の手前のバイト位置
+        self._dict_end = {}
+
+        for c in DICT_COLUMNS:
+
+            p = self._dict_path(c)
+
+            if not os.path.exists(p):
+                continue
+
+            with open(p, "rb") as f:
+                data = f.read()
+
+            end = data.rfind(b"\n") + 1
+
+            if end < len(data):
+                self._dict_end[c] = end
+
+            for v in data[:end].decode("utf-8").split("\n")[:-1]:
+
+                self._codes[c][v] = len(self._values[c])
+                self._values[c].append(v)
+
+        self._columns = None
+        self._n = 0
+
+    # ===============================
+    # パス
+    # ===============================
+    def _dict_path(self, col):
+        return os.path.join(self.path, f"{col}.dict")
+
+    def _col_path(self, col):
+        return os.path.join(self.path, f"{col}.bin")
+
+    def _rows(self) -> int:
+
+        # 全列そろって書けている行数
+        n = None
+
+        for c, t in COLUMNS.items():
+
+            p = self._col_path(c)
+
+            rows = os.path.getsize(p) // array(t).itemsize if os.path.exists(p) else 0
+
+            n = rows if n is None else min(n, rows)
+
+        return n
+
+    # ===============================
+    # 書きかけの切り詰め
+    #  - 列は全列そろった行数まで、辞書は最後の改行まで
+    #  - そのまま追記すると新しい行が他の行の値とずれて混ざる
+    # ===============================
+    def _repair(self):
+
+        for c, end in self._dict_end.items():
+
+            print(f"[WARN] price history: drop torn {c}.dict tail")
+
+            os.truncate(self._dict_path(c), end)
+
+        self._dict_end = {}
+
+        n = self._rows()
+
+        for c, t in COLUMNS.items():
+
+            p = self._col_path(c)
+
+            size = n * array(t).itemsize
+
+            if os.path.exists(p) and os.path.getsize(p) != size:
+
+                print(f"[WARN] price history: truncate {c}.bin to {n} rows")
+
+                os.truncate(p, size)
+
+    # ===============================
+    # 追記
+    # ===============================
+    def append(self, observations) -> int:
+
+        cols = {c: array(t) for c, t in COLUMNS.items()}
+        new_values = {c: [] for c in DICT_COLUMNS}
+
+        for ts, pid, size, site, price, item_id in observations:
+
+            if isinstance(ts, datetime):
+                ts = ts.timestamp()
+
+            cols["ts"].append(int(ts))
+            cols["price"].append(int(price))
+
+            for c, v in (
+                ("id", pid),
+                ("size", size),
+                ("site", site),
+                ("item", item_id),
+            ):
+
+                v = str(v or "").replace("\n", " ").strip()
+
+                code = self._codes[c].get(v)
+
+                if code is None:
+
+                    code = len(self._values[c])
+
+                    self._codes[c][v] = code
+                    self._values[c].append(v)
+                    new_values[c].append(v)
+
+                cols[c].append(code)
+
+        n = len(cols["ts"])
+
+        if not n:
+            return 0
+
+        self._repair()
+
+        # 辞書を先に書く（列側が未知のコードを参照しないように）
+        for c, vs in new_values.items():
+
+            if not vs:
+                continue
+
+            with open(self._dict_path(c), "a", encoding="utf-8") as f:
+                f.write("".join(v + "\n" for v in vs))
+
+        for c, arr in cols.items():
+
+            with open(self._col_path(c), "ab") as f:
+                arr.tofile(f)
+
+        self._columns = None
+
+        return n
+
+    # ===============================
+    # 読み込み
+    # ===============================
+    def columns(self, names=None) -> dict:
+
+        # 列ごとに読んでキャッシュ（行数は最初に読んだ時点で揃える）
+        if self._columns is None:
+
+            self._columns = {}
+            self._n = self._rows()
+
+        for c in names or COLUMNS:
+
+            if c in self._columns:
+                continue
+
+            arr = array(COLUMNS[c])
+            p = self._col_path(c)
+
+            if os.path.exists(p):
+
+                with open(p, "rb") as f:
+                    arr.frombytes(f.read(self._n * arr.itemsize))
+
+            self._columns[c] = arr
+
+        return {c: self._columns[c] for c in names or COLUMNS}
+
+    def __len__(self):
+        return len(self.columns(("ts",))["ts"])
+
+    def select(self, pid=None, size=None, site=None, since=None, until=None) -> list:
+
+        # 条件に合う行番号
+        filters = []
+
+        for c, v in (("id", pid), ("size", size), ("site", site)):
+
+            if v is None:
+                continue
+
+            code = self._codes[c].get(str(v).strip())
+
+            if code is None:
+                return []
+
+            filters.append((c, code))
+
+        rows = None
+
+        for c, code in filters:
+
+            col = self.columns((c,))[c]
+
+            if rows is None:
+                rows = [i for i, v in enumerate(col) if v == code]
+            else:
+                rows = [i for i in rows if col[i] == code]
+
+        if since is None and until is None:
+            return list(range(len(self))) if rows is None else rows
+
+        since = int(since.timestamp() if isinstance(since, datetime) else since or 0)
+        until = int(until.timestamp() if isinstance(until, datetime) else until or 2 ** 62)
+
+        ts = self.columns(("ts",))["ts"]
+
+        if rows is None:
+            return [i for i, v in enumerate(ts) if since <= v < until]
+
+        return [i for i in rows if since <= ts[i] < until]
+
+    def scan(self, pid=None, size=None, site=None, since=None, until=None):
+
+        rows = self.select(pid, size, site, since, until)
+
+        if not rows:
+            return
+
+        cols = self.columns()
+
+        ids = self._values["id"]
+        sizes = self._values["size"]
+        sites = self._values["site"]
+        items = self._values["item"]
+
+        for i in rows:
+
+            yield (
+                cols["ts"][i],
+                ids[cols["id"][i]],
+                sizes[cols["size"][i]],
+                sites[cols["site"][i]],
+                cols["price"][i],
+                items[cols["item"][i]],
+            )
+
+    # ===============================
+    # 期間集計（最安値 / 中央値）
+    # ===============================
+    def query(self, pid, size=None, site=None, since=None, until=None, window="1d"):
+
+        step = parse_window(window)
+
+        buckets = {}
+
+        rows = self.select(pid, size, site, since, until)
+
+        # 集計に使う列だけ読む（ID / item_id は使わない）
+        cols = self.columns(("ts", "size", "site", "price"))
+
+        ts_col, size_col, site_col, price_col = (
+            cols["ts"], cols["size"], cols["site"], cols["price"]
+        )
+
+        sizes = self._values["size"]
+        sites = self._values["site"]
+
+        for i in rows:
+
+            price = price_col[i]
+
+            if price <= 0:
+                continue
+
+            ts = ts_col[i]
+
+            key = (ts - ts % step, sizes[size_col[i]], sites[site_col[i]])
+
+            buckets.setdefault(key, []).append(price)
+
+        out = []
+
+        for (start, s, st), prices in sorted(
+            buckets.items(),
+            key=lambda kv: (kv[0][1], kv[0][2], kv[0][0])
+        ):
+
+            out.append({
+                "start": datetime.fromtimestamp(start),
+                "size": s,
+                "site": st,
+                "min": min(prices),
+                "median": statistics.median(prices),
+                "count": len(prices),
+            })
+
+        return out
+
+
+# ===============================
+# CLI
+# ===============================
+def main(argv=None):
+
+    ap = argparse.ArgumentParser(description="price history query")
+    ap.add_argument("id")
+    ap.add_argument("--size")
+    ap.add_argument("--site")
+    ap.add_argument("--days", type=float, default=30)
+    ap.add_argument("--window", default="1d")
+    ap.add_argument("--path", default=HISTORY_DIR)
+
+    args = ap.parse_args(argv)
+
+    history = PriceHistory(args.path)
+
+    since = time.time() - args.days * 86400
+
+    rows = history.query(
+        args.id,
+        size=args.size,
+        site=args.site,
+        since=since,
+        window=args.window,
+    )
+
+    for r in rows:
+
+        print(
+            f"{r['start']:%Y-%m-%d %H:%M}\t{r['site']}\t{r['size']}\t"
+            f"min={r['min']}\tmedian={r['median']}\tn={r['count']}"
+        )
+
+    if not rows:
+        print("[INFO] no history", file=sys.stderr)
+
+
+if __name__ == "__main__":
+
+    main()
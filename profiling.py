@@ -0,0 +1,315 @@
+# =========================================================
+# プロファイルモード（PROFILE=1 の時だけ有効）
+#  - CPU: 別スレッドで全スレッドのスタックを定期サンプリング
+#    → {name}-{pid}.cpu.folded（speedscope / flamegraph.pl 用）と .cpu.txt
+#  - asyncio: タスクをコルーチン名ごとに集計（件数 / 合計・最大の所要時間）
+#    → {name}-{pid}.tasks.txt
+#  - PROFILE_TRACES=N: 商品ページ表示の遅かった N 件の Playwright トレース
+#    → traces/*.zip（npx playwright show-trace で表示）
+#  - 出力先は PROFILE_DIR（既定 profile/）。ワークフローで artifact に上げる
+#  - イベントループの lag 監視（loop_monitor）は PROFILE に関係なく常時
+# =========================================================
+
+import os
+import sys
+import time
+import heapq
+import asyncio
+import threading
+from collections import Counter
+
+from loop_monitor import LoopMonitor, LOOP_LAG_MONITOR
+
+
+PROFILE = os.environ.get("PROFILE", "0") not in ("", "0")
+
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profile")
+
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", 10))
+
+PROFILE_TRACES = int(os.environ.get("PROFILE_TRACES", 0))
+
+TOP_N = 40
+
+
+def _artifact(name, suffix) -> str:
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+
+    return os.path.join(PROFILE_DIR, f"{name}-{os.getpid()}{suffix}")
+
+
+def _frame_label(frame) -> str:
+
+    code = frame.f_code
+
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+# ===============================
+# CPU サンプリング
+# ===============================
+class Sampler:
+
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS):
+
+        self.interval = interval_ms / 1000
+        self.stacks = Counter()
+        self.samples = 0
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._loop,
+            name="profile-sampler",
+            daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+
+        self._stop.set()
+        self._thread.join()
+
+    def _loop(self):
+
+        me = threading.get_ident()
+
+        names = {}
+
+        while not self._stop.wait(self.interval):
+
+            for t in threading.enumerate():
+                names[t.ident] = t.name
+
+            for ident, frame in sys._current_frames().items():
+
+                if ident == me:
+                    continue
+
+                stack = []
+
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+
+                stack.append(names.get(ident, str(ident)))
+
+                self.stacks[";".join(reversed(stack))] += 1
+
+            self.samples += 1
+
+    def write(self, name):
+
+        with open(_artifact(name, ".cpu.folded"), "w", encoding="utf-8") as f:
+
+            for stack, n in self.stacks.most_common():
+                f.write(f"{stack} {n}\n")
+
+        own = Counter()
+        total = Counter()
+
+        for stack, n in self.stacks.items():
+
+            frames = stack.split(";")
+
+            own[frames[-1]] += n
+
+            for fr in set(frames[1:]):
+                total[fr] += n
+
+        with open(_artifact(name, ".cpu.txt"), "w", encoding="utf-8") as f:
+
+            f.write(f"samples={self.samples} interval={self.interval * 1000:.0f}ms\n")
+
+            for title, counter in (("self", own), ("inclusive", total)):
+
+                f.write(f"\n== {title} ==\n")
+
+                for label, n in counter.most_common(TOP_N):
+                    f.write(f"{n:8d}  {label}\n")
+
+
+# ===============================
+# asyncio タスクの所要時間
+# ===============================
+class TaskStats:
+
+    def __init__(self):
+        self.by_name = {}
+
+    def factory(self, loop, coro, context=None):
+
+        # context 引数は 3.11 から（yahoo は 3.10 で動く）
+        if context is None:
+            task = asyncio.Task(coro, loop=loop)
+        else:
+            task = asyncio.Task(coro, loop=loop, context=context)
+
+        name = getattr(coro, "__qualname__", type(coro).__name__)
+
+        started = time.perf_counter()
+
+        def done(_):
+
+            s = self.by_name.setdefault(name, [0, 0.0, 0.0])
+
+            sec = time.perf_counter() - started
+
+            s[0] += 1
+            s[1] += sec
+            s[2] = max(s[2], sec)
+
+        task.add_done_callback(done)
+
+        return task
+
+    def write(self, name, wall):
+
+        rows = sorted(self.by_name.items(), key=lambda kv: -kv[1][1])
+
+        with open(_artifact(name, ".tasks.txt"), "w", encoding="utf-8") as f:
+
+            f.write(f"wall={wall:.1f}s\n")
+            f.write(f"{'total_s':>10} {'max_s':>9} {'mean_s':>9} {'count':>7}  coroutine\n")
+
+            for coro, (count, total, longest) in rows:
+                f.write(
+                    f"{total:10.1f} {longest:9.2f} {total / count:9.3f} "
+                    f"{count:7d}  {coro}\n"
+                )
+
+
+# ===============================
+# 遅い商品ページの Playwright トレース
+#  - start(context) したコンテキストで traced() を呼ぶと1ページ1チャンク
+#  - チャンクは同じコンテキストで重ねられないので、1コンテキスト1ページで使う
+# ===============================
+class PageTracer:
+
+    def __init__(self, keep: int = PROFILE_TRACES):
+
+        self.keep = keep
+        self.enabled = PROFILE and keep > 0
+
+        self.slowest = []
+
+    async def start(self, context):
+
+        if self.enabled:
+            await context.tracing.start(screenshots=True, snapshots=True)
+
+    async def traced(self, page, label, fn):
+
+        if not self.enabled:
+            return await fn()
+
+        tracing = page.context.tracing
+
+        await tracing.start_chunk(title=label)
+
+        t0 = time.perf_counter()
+
+        try:
+            return await fn()
+
+        finally:
+
+            sec = time.perf_counter() - t0
+
+            if len(self.slowest) < self.keep or sec > self.slowest[0][0]:
+
+                path = os.path.join(
+                    PROFILE_DIR,
+                    "traces",
+                    f"{os.getpid()}-{sec:07.2f}s-{label}.zip"
+                )
+
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+
+                await tracing.stop_chunk(path=path)
+
+                heapq.heappush(self.slowest, (sec, path))
+
+                if len(self.slowest) > self.keep:
+
+                    _, drop = heapq.heappop(self.slowest)
+
+                    try:
+                        os.remove(drop)
+                    except OSError:
+                        pass
+
+            else:
+                await tracing.stop_chunk()
+
+
+_tracer = None
+
+
+def tracer() -> PageTracer:
+
+    global _tracer
+
+    if _tracer is None:
+        _tracer = PageTracer()
+
+    return _tracer
+
+
+# ===============================
+# エントリポイント
+#  - asyncio.run(profiled("name", main())) のように包む
+# ===============================
+async def profiled(name: str, coro):
+
+    monitor = LoopMonitor() if LOOP_LAG_MONITOR else None
+
+    if monitor:
+        monitor.start()
+
+    try:
+
+        if not PROFILE:
+            return await coro
+
+        return await _profile(name, coro)
+
+    finally:
+
+        if monitor:
+
+            monitor.stop()
+
+            print(monitor.summary())
+
+
+async def _profile(name: str, coro):
+
+    sampler = Sampler()
+    tasks = TaskStats()
+
+    loop = asyncio.get_running_loop()
+
+    loop.set_task_factory(tasks.factory)
+
+    sampler.start()
+
+    t0 = time.perf_counter()
+
+    try:
+        return await coro
+
+    finally:
+
+        wall = time.perf_counter() - t0
+
+        sampler.stop()
+
+        loop.set_task_factory(None)
+
+        sampler.write(name)
+        tasks.write(name, wall)
+
+        print(f"[INFO] profile written: {PROFILE_DIR}/{name}-{os.getpid()}.*")
@@ -0,0 +1,432 @@
+# =========================================================
+# 大規模カタログの負荷試験
+#  - 合成カタログ（入力シート / 既存の出力シート）を偽ワークシートに用意
+#  - 検索 / 商品 API のレスポンスも合成し、パース処理は本物を通す
+#  - mercari_scraper.run() / yahoo_main.run() / main_snkrdunk_product.main()
+#    をそのまま実行（ブラウザ・ネットワーク・認証なし）
+#  - 段階ごとの時間・呼び出し回数・ピークメモリ、Sheets API 呼び出し数を出力
+#
+#  python scale_harness.py --site mercari --products 10000
+#  python scale_harness.py --all                 # 1k / 10k / 100k を別プロセスで
+# =========================================================
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import resource
+import tempfile
+import subprocess
+import contextlib
+from functools import wraps
+
+
+# import 時に読む設定を先に固定する
+os.environ["SCRAPER_WORKERS"] = "1"
+os.environ.setdefault("PRICE_HISTORY_DIR", tempfile.mkdtemp(prefix="harness_history_"))
+os.environ.setdefault("NEGATIVE_CACHE_PATH", os.path.join(tempfile.mkdtemp(), "negative.json"))
+os.environ.setdefault("STORE_PATH", os.path.join(tempfile.mkdtemp(prefix="harness_store_"), "prices.db"))
+
+import store
+import sheets
+import aggregate
+import sheet_table
+import price_history
+
+
+SIZES = [f"{23 + i * 0.5:g}" for i in range(15)]
+
+SCALES = (1_000, 10_000, 100_000)
+
+
+# ===============================
+# 計測
+# ===============================
+def peak_rss_mb() -> float:
+
+    # Linux の ru_maxrss は KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Stats:
+
+    def __init__(self):
+
+        self.stages = {}
+        self.api = {}
+
+    def count(self, name, n=1):
+
+        self.api[name] = self.api.get(name, 0) + n
+
+    def add(self, name, sec):
+
+        s = self.stages.setdefault(name, {"sec": 0.0, "calls": 0, "peak": 0.0})
+
+        s["sec"] += sec
+        s["calls"] += 1
+        s["peak"] = max(s["peak"], peak_rss_mb())
+
+    def timed(self, name, fn):
+
+        if asyncio.iscoroutinefunction(fn):
+
+            @wraps(fn)
+            async def run_async(*args, **kwargs):
+
+                t0 = time.perf_counter()
+
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    self.add(name, time.perf_counter() - t0)
+
+            return run_async
+
+        @wraps(fn)
+        def run_sync(*args, **kwargs):
+
+            t0 = time.perf_counter()
+
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.add(name, time.perf_counter() - t0)
+
+        return run_sync
+
+    def report(self, label, wall):
+
+        print(f"\n[HARNESS] {label} wall={wall:.2f}s peak_rss={peak_rss_mb():.0f}MB")
+
+        for name, s in self.stages.items():
+            print(
+                f"  stage {name:22s} {s['sec']:9.3f}s "
+                f"calls={s['calls']:<7d} peak_rss={s['peak']:.0f}MB"
+            )
+
+        for name, n in sorted(self.api.items()):
+            print(f"  api   {name:22s} {n}")
+
+
+STATS = Stats()
+
+
+# ===============================
+# 偽 Sheets クライアント
+# ===============================
+class FakeWorksheet:
+
+    def __init__(self, values):
+
+        self.values = values
+        self.row_count = max(len(values), 1000)
+
+    def get_all_values(self):
+
+        STATS.count("sheets.get_all_values")
+
+        return [list(r) for r in self.values]
+
+    def get_all_records(self):
+
+        STATS.count("sheets.get_all_records")
+
+        header = self.values[0]
+
+        return [dict(zip(header, r)) for r in self.values[1:]]
+
+    def batch_update(self, data, value_input_option="RAW"):
+
+        STATS.count("sheets.batch_update")
+        STATS.count("sheets.ranges", len(data))
+        STATS.count("sheets.cells", sum(
+            len(d["values"]) * len(d["values"][0]) for d in data
+        ))
+
+    def add_rows(self, n):
+
+        STATS.count("sheets.add_rows")
+
+        self.row_count += n
+
+
+class FakeSpreadsheet:
+
+    def __init__(self, sheets_by_gid):
+        self.sheets_by_gid = sheets_by_gid
+
+    def get_worksheet_by_id(self, gid):
+        return self.sheets_by_gid[int(gid)]
+
+
+class FakeClient:
+
+    def __init__(self, sheets_by_gid):
+        self.spreadsheet = FakeSpreadsheet(sheets_by_gid)
+
+    def open_by_url(self, url):
+
+        STATS.count("sheets.open_by_url")
+
+        return self.spreadsheet
+
+
+# ===============================
+# 合成カタログ
+#  - existing: 前回の出力が残っている商品の割合
+# ===============================
+def make_catalog(n, seed=0):
+
+    rnd = random.Random(seed)
+
+    return [
+        {
+            "ID": str(100000 + i),
+            "NAME": f"SYNTH {rnd.choice(['Dunk', 'Jordan 1', 'Yeezy', 'Samba'])} {i}",
+        }
+        for i in range(n)
+    ]
+
+
+def existing_rows(catalog, site, existing=0.5, seed=0):
+
+    rnd = random.Random(seed + 1)
+
+    rows = []
+
+    for p in catalog:
+
+        if rnd.random() >= existing:
+            continue
+
+        for size in rnd.sample(SIZES, 6):
+            rows.append([p["ID"], p["NAME"], size, site, "12000", "", "2024-01-01 00:00:00"])
+
+    return rows
+
+
+def search_items(keyword, n, rnd):
+
+    return [(f"m{abs(hash((keyword, j))) % 10**11}", rnd.randint(5000, 60000)) for j in range(n)]
+
+
+# ===============================
+# Mercari（scrape_targets を合成レスポンスに差し替え）
+# ===============================
+def setup_mercari(catalog, items_per_search):
+
+    import mercari_scraper as m
+    from mercari_common import extract_item_candidates, size_from_api, HEADER, SITE_CODE
+    from models import Candidate
+
+    rnd = random.Random(2)
+
+    async def fake_scrape_targets(targets, block_assets=False):
+
+        results = []
+
+        for r in targets:
+
+            STATS.count("mercari.search")
+
+            data = {"items": [
+                {"id": i, "price": str(price), "itemConditionId": 1}
+                for i, price in search_items(r["NAME"], items_per_search, rnd)
+            ]}
+
+            found = []
+
+            for x in extract_item_candidates(data):
+
+                STATS.count("mercari.item_api")
+
+                size = size_from_api({"size": "", "text": f"サイズ: {rnd.choice(SIZES)}cm"})
+
+                if size:
+                    found.append(Candidate(SITE_CODE, x.item_id, x.price, size))
+
+            results.append((str(r["ID"]), r["NAME"], found))
+
+        return results
+
+    inputs = [["ID", "NAME", "update"]] + [[p["ID"], p["NAME"], "1"] for p in catalog]
+
+    output = [HEADER] + existing_rows(catalog, SITE_CODE)
+
+    sheets.set_client_factory(lambda: FakeClient({
+        m.INPUT_GID: FakeWorksheet(inputs),
+        m.OUTPUT_GID: FakeWorksheet(output),
+    }))
+
+    m.scrape_targets = STATS.timed("scrape (synthetic)", fake_scrape_targets)
+    m.load_targets = STATS.timed("read targets", m.load_targets)
+    m.load_output_table = STATS.timed("read output table", m.load_output_table)
+    m.sync = STATS.timed("sheet sync", m.sync)
+    m.build_output = STATS.timed("build_output", m.build_output)
+
+    return lambda: m.run("1")
+
+
+# ===============================
+# Yahoo（scrape_keywords を合成レスポンスに差し替え）
+# ===============================
+def setup_yahoo(catalog, items_per_search):
+
+    import yahoo_main as y
+    from yahoo_common import extract_item_candidates, sizes_from_item, normalize_size, HEADERS, SITE_CODE
+    from models import Candidate
+
+    rnd = random.Random(3)
+
+    async def fake_scrape_keywords(pairs, workers=1):
+
+        results = []
+
+        for keyword, product_id in pairs:
+
+            STATS.count("yahoo.search")
+
+            items = [
+                {"id": i, "price": price, "itemStatus": "OPEN", "condition": "new"}
+                for i, price in search_items(keyword, items_per_search, rnd)
+            ]
+
+            candidates = []
+
+            for x in extract_item_candidates(items):
+
+                STATS.count("yahoo.item_api")
+
+                sizes = sizes_from_item({"item": {"title": keyword, "spec": {"size": rnd.choice(SIZES)}}})
+
+                for s in sizes:
+                    candidates.append(Candidate(SITE_CODE, x.item_id, x.price, normalize_size(s)))
+
+            results.append((product_id, keyword, candidates))
+
+        return results
+
+    inputs = [["ID", "NAME"]] + [[p["ID"], p["NAME"]] for p in catalog]
+
+    output = [HEADERS] + existing_rows(catalog, SITE_CODE)
+
+    sheets.set_client_factory(lambda: FakeClient({
+        y.INPUT_SHEET_GID: FakeWorksheet(inputs),
+        y.OUTPUT_SHEET_GID: FakeWorksheet(output),
+    }))
+
+    y.scrape_keywords = STATS.timed("scrape (synthetic)", fake_scrape_keywords)
+    y.load_input_products = STATS.timed("read targets", y.load_input_products)
+    y.prepare_output_sheet = STATS.timed("read output table", y.prepare_output_sheet)
+    y.sync = STATS.timed("sheet sync", y.sync)
+    y.build_output = STATS.timed("build_output", y.build_output)
+
+    return y.run
+
+
+# ===============================
+# SNKRDUNK（fetch_product を合成 HTML のパースに差し替え）
+# ===============================
+def setup_snkrdunk(catalog, items_per_search):
+
+    import main_snkrdunk_product as s
+
+    html = """
+<html><body><h1>{name}</h1><p class="product-name-jp">{name}</p>
+<table class="product-detail-info-table">
+<tr><th>ブランド</th><td>Nike</td></tr><tr><th>モデル</th><td>Dunk</td></tr>
+<tr><th>発売日</th><td>2024/01/01</td></tr><tr><th>定価</th><td>¥16,500</td></tr>
+</table><img src="https://cdn.snkrdunk.com/upload_bg_removed/{code}.png">
+</body></html>
+"""
+
+    async def fake_fetch_product(code):
+
+        STATS.count("snkrdunk.product_page")
+
+        return s.parse_product_html(code, html.format(name=f"SYNTH {code}", code=code))
+
+    rows = [[p["ID"]] for p in catalog]
+
+    sheets.set_client_factory(lambda: FakeClient({
+        s.TARGET_GID: FakeWorksheet([["ID"]] + rows),
+    }))
+
+    s.fetch_product = STATS.timed("fetch+parse (synthetic)", fake_fetch_product)
+    s.open_table = STATS.timed("read table", s.open_table)
+
+    return s.main
+
+
+SETUPS = {
+    "mercari": setup_mercari,
+    "yahoo": setup_yahoo,
+    "snkrdunk": setup_snkrdunk,
+}
+
+
+def run_one(site, n, items_per_search, verbose=False):
+
+    os.environ.setdefault("SPREADSHEET_URL", "harness://fake")
+
+    catalog = make_catalog(n)
+
+    entry = SETUPS[site](catalog, items_per_search)
+
+    # 共通の段階（書き込み / 集計 / 履歴）
+    sheet_table.SheetTable.take_pending = STATS.timed("take_pending", sheet_table.SheetTable.take_pending)
+    sheet_table.SheetTable.write = STATS.timed("sheet write", sheet_table.SheetTable.write)
+    sheet_table.SheetTable.upsert = STATS.timed("table upsert", sheet_table.SheetTable.upsert)
+    sheet_table.SheetTable.update = STATS.timed("table update", sheet_table.SheetTable.update)
+    aggregate.CandidateFrame.add = STATS.timed("frame add", aggregate.CandidateFrame.add)
+    aggregate.CandidateFrame.cheapest = STATS.timed("cheapest", aggregate.CandidateFrame.cheapest)
+    price_history.PriceHistory.append = STATS.timed("history append", price_history.PriceHistory.append)
+    store.Store.import_table = STATS.timed("store import", store.Store.import_table)
+    store.Store.upsert = STATS.timed("store upsert", store.Store.upsert)
+    store.Store.sizes = STATS.timed("store sizes", store.Store.sizes)
+
+    t0 = time.perf_counter()
+
+    out = sys.stdout if verbose else open(os.devnull, "w")
+
+    with contextlib.redirect_stdout(out):
+        asyncio.run(entry())
+
+    STATS.report(f"site={site} products={n}", time.perf_counter() - t0)
+
+    print(" ", sheets.report())
+
+
+def main():
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--site", choices=list(SETUPS), default="mercari")
+    ap.add_argument("--products", type=int, default=1000)
+    ap.add_argument("--items", type=int, default=30, help="検索1回あたりの商品数")
+    ap.add_argument("--all", action="store_true", help="全サイト x 1k/10k/100k")
+    ap.add_argument("--verbose", action="store_true")
+    args = ap.parse_args()
+
+    if not args.all:
+
+        run_one(args.site, args.products, args.items, args.verbose)
+
+        return
+
+    # ピークメモリを分けるため1組ずつ別プロセス
+    for site in SETUPS:
+
+        for n in SCALES:
+
+            subprocess.run(
+                [sys.executable, __file__, "--site", site,
+                 "--products", str(n), "--items", str(args.items)],
+                check=True
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# =========================================================
+# マルチプロセス分割実行
+#  - 対象リストを K 個に分け、プロセスごとに別ブラウザで処理
+#  - K は SCRAPER_WORKERS（数値 / auto）。auto は CPU 数と空きメモリから決定
+#  - 結果は親プロセスに戻し、シート書き込みは親で1回だけ行う
+#  - サーキットブレーカーの状態は実行ごとの BREAKER_STATE_DIR で全プロセス共有
+# =========================================================
+
+import os
+import asyncio
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from profiling import profiled
+
+
+# 1ブラウザ（ページ数枚込み）あたりの想定メモリ
+BROWSER_MEMORY_MB = int(os.environ.get("BROWSER_MEMORY_MB", 1024))
+
+
+def available_memory_mb():
+
+    try:
+
+        with open("/proc/meminfo") as f:
+
+            for line in f:
+
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+
+    except OSError:
+        pass
+
+    return None
+
+
+def auto_worker_count(n_targets: int, setting: str = None) -> int:
+
+    if setting is None:
+        setting = os.environ.get("SCRAPER_WORKERS", "auto")
+
+    setting = str(setting).strip().lower()
+
+    if setting != "auto":
+        return max(1, min(int(setting), n_targets or 1))
+
+    k = os.cpu_count() or 1
+
+    mem = available_memory_mb()
+
+    if mem is not None:
+        k = min(k, mem // BROWSER_MEMORY_MB)
+
+    return max(1, min(k, n_targets or 1))
+
+
+def split(targets: list, k: int) -> list:
+
+    # 先頭に重い対象が偏らないよう round-robin で配る
+    return [targets[i::k] for i in range(k) if targets[i::k]]
+
+
+def _init_shard(state_dir):
+
+    # 子プロセスの CircuitBreaker が同じファイルで trip / SiteDown を共有する
+    os.environ["BREAKER_STATE_DIR"] = state_dir
+
+
+def _run_shard(scrape, shard):
+
+    # PROFILE=1 なら子プロセスごとにプロファイルを出力
+    return asyncio.run(profiled("shard", scrape(shard)))
+
+
+# ===============================
+# 実行
+#  - scrape: async def scrape(targets) -> list（モジュールのトップレベル関数）
+#  - on_shard: シャードが終わるたびに結果を渡す async 関数（任意）
+#  - 戻り値: 各シャードの結果をつなげた list
+# ===============================
+async def run_sharded(scrape, targets: list, k: int, on_shard=None) -> list:
+
+    if k <= 1:
+
+        results = await scrape(targets)
+
+        if on_shard:
+            await on_shard(results)
+
+        return results
+
+    shards = split(targets, k)
+
+    print(f"[INFO] workers={len(shards)} targets={len(targets)}")
+
+    # import 時の副作用が無いので spawn で新しいプロセスから起動する
+    # （親の Sheets I/O スレッドを fork で持ち込まない）
+    ctx = multiprocessing.get_context("spawn")
+
+    loop = asyncio.get_running_loop()
+
+    out = []
+
+    # 実行ごとに作る（前回の実行の trip を持ち越さない）
+    state_dir = tempfile.TemporaryDirectory(prefix="breaker-")
+
+    pool = ProcessPoolExecutor(
+        len(shards),
+        mp_context=ctx,
+        initializer=_init_shard,
+        initargs=(state_dir.name,)
+    )
+
+    with state_dir, pool:
+
+        futures = [
+            loop.run_in_executor(pool, _run_shard, scrape, shard)
+            for shard in shards
+        ]
+
+        for fut in asyncio.as_completed(futures):
+
+            results = await fut
+
+            if on_shard:
+                await on_shard(results)
+
+            out.extend(results)
+
+    return out
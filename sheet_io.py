@@ -0,0 +1,82 @@
+# =========================================================
+# Sheets I/O をバックグラウンドスレッドで実行
+#  - gspread の呼び出しは全てブロッキングなので専用スレッド1本に集約
+#  - read(): 起動直後に投げておき、必要になった時点で await
+#  - write(): キューに積むだけで即戻る（スクレイピングは継続）
+#  - drain(): 最後に全書き込みの完了を待って結果を確認
+# =========================================================
+
+import asyncio
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+
+class SheetIO:
+
+    def __init__(self):
+
+        # gspread クライアントはスレッド間で共有しないよう1本だけ
+        self._pool = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="sheet-io"
+        )
+
+        self._writes = []
+
+    def _submit(self, fn, *args, **kwargs):
+
+        return asyncio.get_running_loop().run_in_executor(
+            self._pool,
+            partial(fn, *args, **kwargs)
+        )
+
+    def read(self, fn, *args, **kwargs) -> asyncio.Future:
+
+        return self._submit(fn, *args, **kwargs)
+
+    def write(self, fn, *args, **kwargs) -> asyncio.Future:
+
+        fut = self._submit(fn, *args, **kwargs)
+
+        self._writes.append(fut)
+
+        return fut
+
+    async def drain(self) -> list:
+
+        results = await asyncio.gather(
+            *self._writes,
+            return_exceptions=True
+        )
+
+        self._writes.clear()
+
+        errors = [r for r in results if isinstance(r, BaseException)]
+
+        print(
+            f"[INFO] sheet writes confirmed={len(results) - len(errors)} "
+            f"failed={len(errors)}"
+        )
+
+        if errors:
+            raise errors[0]
+
+        return results
+
+    def close(self):
+
+        self._pool.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+
+        try:
+
+            if self._writes:
+                await self.drain()
+
+        finally:
+
+            self.close()
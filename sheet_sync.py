@@ -0,0 +1,86 @@
+# =========================================================
+# SQLite（store）→ 出力シートの同期
+#  - シートに未反映の行（version != synced）だけを送る
+#    変更が無ければシートは読まない
+#  - 行の位置は送る直前に読んだシートで決める
+#    （手で並べ替えられても、他のジョブが同じシートに追記していてもずれない）
+#  - 送れた version だけ同期済みにするので、途中で落ちても次回に再送される
+#  - SHEET_SYNC=0: スクレイパーの最後では同期しない（別ジョブで実行する時）
+#
+#  python sheet_sync.py mercari
+#  python sheet_sync.py yahoo
+# =========================================================
+
+import os
+import sys
+import argparse
+
+from store import Store, STORE_PATH
+from sheets import report as sheets_report
+
+
+SHEET_SYNC = os.environ.get("SHEET_SYNC", "1") != "0"
+
+
+def sync(site: str, open_table, path: str = STORE_PATH) -> int:
+
+    # 呼び出し元と別スレッドで動くので接続も別に開く
+    store = Store(path)
+
+    try:
+
+        sent = store.changed(site)
+
+        if not sent:
+
+            print(f"[INFO] sheet sync {site}: no changes")
+
+            return 0
+
+        table = open_table()
+
+        for _, row in sent:
+            table.upsert(row)
+
+        cells = table.flush()
+
+        store.mark_synced(site, sent)
+
+        print(f"[INFO] sheet sync {site}: rows={len(sent)} cells={cells}")
+
+        return cells
+
+    finally:
+
+        store.close()
+
+
+def targets() -> dict:
+
+    # スクレイパー側も sync を import するので使う時に読む
+    import mercari_scraper
+    import yahoo_main
+
+    return {
+        "mercari": (mercari_scraper.SITE_CODE, mercari_scraper.load_output_table),
+        "yahoo": (yahoo_main.SITE_CODE, yahoo_main.prepare_output_sheet),
+    }
+
+
+def main(argv=None):
+
+    ap = argparse.ArgumentParser(description="push store changes to the output sheet")
+    ap.add_argument("site", choices=["mercari", "yahoo"])
+    ap.add_argument("--path", default=STORE_PATH)
+
+    args = ap.parse_args(argv)
+
+    site, open_table = targets()[args.site]
+
+    sync(site, open_table, args.path)
+
+    print(sheets_report())
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
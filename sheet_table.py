@@ -0,0 +1,316 @@
+# =========================================================
+# 出力シートのインメモリモデル
+#  - get_all_values() 1回で読み込み
+#  - (ID, SIZE, SITE) キー / ID / SITE / 行番号 のインデックス
+#  - 変更セルだけを記録し、flush() で1回の batch_update にまとめる
+#  - 行内で SHEET_MERGE_GAP 列以下の隙間は現在値で埋めて1レンジにする
+#    （例: PRICE と UPDATED だけの更新も行をまたいで1ブロックになる）
+# =========================================================
+
+import os
+
+
+SHEET_MERGE_GAP = int(os.environ.get("SHEET_MERGE_GAP", 1))
+
+
+def col_letter(col: int) -> str:
+
+    s = ""
+
+    col += 1
+
+    while col:
+
+        col, rem = divmod(col - 1, 26)
+
+        s = chr(65 + rem) + s
+
+    return s
+
+
+def _runs(cols, gap=0):
+
+    # 連続した列番号をまとめる [1,2,3,5] -> [(1,3),(5,5)]
+    # gap=1 なら1列の隙間も埋める [1,2,3,5] -> [(1,5)]
+    runs = []
+
+    for c in sorted(cols):
+
+        if runs and c - runs[-1][1] <= gap + 1:
+            runs[-1][1] = c
+        else:
+            runs.append([c, c])
+
+    return [tuple(r) for r in runs]
+
+
+class SheetTable:
+
+    def __init__(
+        self,
+        ws,
+        header,
+        key_columns=(0, 2, 3),
+        normalize=None,
+        value_input_option="RAW",
+    ):
+
+        self.ws = ws
+        self.key_columns = tuple(key_columns)
+        self.normalize = normalize or {}
+        self.value_input_option = value_input_option
+
+        values = ws.get_all_values()
+
+        if values:
+
+            self.header = values[0]
+            body = values[1:]
+            self._write_header = False
+
+        else:
+
+            self.header = list(header)
+            body = []
+            self._write_header = True
+
+        self.width = len(self.header)
+
+        self.rows = {}
+        self.by_key = {}
+        self.by_id = {}
+        self.by_site = {}
+
+        self._dirty = {}
+
+        for row_num, r in enumerate(body, start=2):
+
+            self.rows[row_num] = list(r)
+            self._index(row_num)
+
+        self.last_row = len(body) + 1
+
+        # 最終行（upsert のたびに max(rows) を取ると件数の2乗になる）
+        self.max_row = self.last_row
+
+    # ===============================
+    # インデックス
+    # ===============================
+    def key_of(self, values):
+
+        key = []
+
+        for c in self.key_columns:
+
+            v = str(values[c]).strip() if c < len(values) else ""
+
+            if c in self.normalize and v:
+                v = self.normalize[c](v)
+
+            if not v:
+                return None
+
+            key.append(v)
+
+        return tuple(key)
+
+    def _index(self, row_num):
+
+        key = self.key_of(self.rows[row_num])
+
+        if key is None:
+            return
+
+        self.by_key[key] = row_num
+
+        self.by_id.setdefault(key[0], set()).add(key)
+
+        if len(key) >= 3:
+            self.by_site.setdefault(key[2], set()).add(key)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, key):
+        return key in self.by_key
+
+    def get(self, key):
+
+        row_num = self.by_key.get(key)
+
+        return None if row_num is None else self.rows[row_num]
+
+    def row_number(self, key):
+        return self.by_key.get(key)
+
+    def keys_for_id(self, pid):
+        return self.by_id.get(str(pid), set())
+
+    def keys_for_site(self, site):
+        return self.by_site.get(site, set())
+
+    def sizes(self, pid, site) -> set:
+
+        return {
+            key[1] for key in self.by_id.get(str(pid), ())
+            if key[2] == site
+        }
+
+    # ===============================
+    # 更新
+    # ===============================
+    def set_cells(self, row_num, cells: dict):
+
+        row = self.rows.setdefault(row_num, [])
+
+        self.max_row = max(self.max_row, row_num)
+
+        changed = self._dirty.setdefault(row_num, set())
+
+        for col, v in cells.items():
+
+            if len(row) <= col:
+                row.extend([""] * (col + 1 - len(row)))
+
+            if row_num <= self.last_row and str(row[col]) == str(v):
+                continue
+
+            row[col] = v
+            changed.add(col)
+
+        if not changed:
+            del self._dirty[row_num]
+
+    def update(self, key, cells: dict):
+
+        self.set_cells(self.by_key[key], cells)
+
+    def upsert(self, values) -> int:
+
+        # list / OutputRow（列順に iterate できるもの）
+        values = list(values)
+
+        key = self.key_of(values)
+
+        row_num = self.by_key.get(key)
+
+        if row_num is None:
+
+            row_num = self.max_row + 1
+
+            self.rows[row_num] = []
+
+            self.set_cells(row_num, dict(enumerate(values)))
+
+            self._index(row_num)
+
+        else:
+
+            self.set_cells(row_num, dict(enumerate(values)))
+
+        return row_num
+
+    @property
+    def dirty_rows(self):
+        return sorted(self._dirty)
+
+    # ===============================
+    # 書き込み
+    # ===============================
+    def pending_updates(self) -> list:
+
+        updates = []
+
+        if self._write_header and self.header:
+
+            updates.append({
+                "range": f"A1:{col_letter(self.width - 1)}1",
+                "values": [list(self.header)],
+            })
+
+        # 同じ列範囲で連続する行は1つのレンジにまとめる
+        block = None
+
+        for row_num in self.dirty_rows:
+
+            row = self.rows[row_num]
+
+            for start, end in _runs(self._dirty[row_num], SHEET_MERGE_GAP):
+
+                values = row[start:end + 1]
+
+                values += [""] * (end + 1 - start - len(values))
+
+                if (
+                    block
+                    and block["cols"] == (start, end)
+                    and block["end"] == row_num - 1
+                ):
+
+                    block["end"] = row_num
+                    block["values"].append(values)
+                    continue
+
+                if block:
+                    updates.append(self._range(block))
+
+                block = {
+                    "cols": (start, end),
+                    "start": row_num,
+                    "end": row_num,
+                    "values": [values],
+                }
+
+        if block:
+            updates.append(self._range(block))
+
+        return updates
+
+    def _range(self, block):
+
+        start, end = block["cols"]
+
+        return {
+            "range": (
+                f"{col_letter(start)}{block['start']}:"
+                f"{col_letter(end)}{block['end']}"
+            ),
+            "values": block["values"],
+        }
+
+    # ===============================
+    # 変更分を取り出して dirty をクリア（書き込みは write() で別スレッド可）
+    # ===============================
+    def take_pending(self):
+
+        updates = self.pending_updates()
+
+        need = self.max_row
+
+        self._dirty.clear()
+        self._write_header = False
+        self.last_row = max(self.last_row, need)
+
+        return updates, need
+
+    def write(self, updates, need) -> int:
+
+        if not updates:
+            return 0
+
+        if need > self.ws.row_count:
+            self.ws.add_rows(need - self.ws.row_count)
+
+        self.ws.batch_update(
+            updates,
+            value_input_option=self.value_input_option
+        )
+
+        return sum(
+            len(u["values"]) * len(u["values"][0])
+            for u in updates
+        )
+
+    def flush(self) -> int:
+
+        return self.write(*self.take_pending())
@@ -0,0 +1,311 @@
+# =========================================================
+# Google Sheets クライアント（遅延生成）
+#  - import しただけでは認証もネットワークアクセスもしない
+#  - 初回の get_worksheet() で認証し、以降はキャッシュを使う
+#  - set_client_factory() でテスト / ベンチ用の偽クライアントに差し替え可能
+#  - ワークシートは QuotaWorksheet で包む
+#    ・1分あたりの読み / 書きリクエスト数を SHEETS_*_PER_MIN 以内に抑える
+#    ・429 / 5xx は指数バックオフ（ジッタ付き）で再試行
+#    ・batch_update は SHEETS_MAX_CELLS_PER_CALL セルごとに分割
+#    ・呼び出し数・書き込みセル数を report() で出力
+# =========================================================
+
+import os
+import json
+import time
+import re
+import random
+import threading
+from collections import deque
+
+
+SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
+
+# Sheets API の既定クォータは 1ユーザー 60回/分（読み・書きそれぞれ）
+# シャードが同じスプレッドシートを使う時は小さめに設定する
+SHEETS_READS_PER_MIN = int(os.environ.get("SHEETS_READS_PER_MIN", 60))
+SHEETS_WRITES_PER_MIN = int(os.environ.get("SHEETS_WRITES_PER_MIN", 60))
+
+SHEETS_MAX_RETRIES = int(os.environ.get("SHEETS_MAX_RETRIES", 6))
+SHEETS_BACKOFF_MAX_SEC = float(os.environ.get("SHEETS_BACKOFF_MAX_SEC", 64))
+
+SHEETS_MAX_CELLS_PER_CALL = int(
+    os.environ.get("SHEETS_MAX_CELLS_PER_CALL", 50_000)
+)
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+READ_METHODS = {
+    "get_all_values", "get_all_records", "get", "batch_get",
+    "row_values", "col_values", "acell", "cell",
+}
+
+WRITE_METHODS = {
+    "update", "batch_update", "append_row", "append_rows",
+    "add_rows", "clear", "batch_clear", "delete_rows", "insert_rows",
+}
+
+
+# ===============================
+# 1分あたりのリクエスト数制限（スライディングウィンドウ）
+# ===============================
+class Quota:
+
+    def __init__(self, per_min: int):
+
+        self.per_min = per_min
+        self.calls = deque()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+
+        waited = 0.0
+
+        while True:
+
+            with self.lock:
+
+                now = time.monotonic()
+
+                while self.calls and now - self.calls[0] >= 60:
+                    self.calls.popleft()
+
+                if len(self.calls) < self.per_min:
+
+                    self.calls.append(now)
+
+                    return waited
+
+                wait = 60 - (now - self.calls[0])
+
+            time.sleep(wait)
+
+            waited += wait
+
+
+class Stats:
+
+    def __init__(self):
+
+        self.reads = 0
+        self.writes = 0
+        self.cells = 0
+        self.retries = 0
+        self.throttled = 0.0
+
+        self.lock = threading.Lock()
+
+    def add(self, **kw):
+
+        with self.lock:
+
+            for k, v in kw.items():
+                setattr(self, k, getattr(self, k) + v)
+
+
+QUOTAS = {
+    "read": Quota(SHEETS_READS_PER_MIN),
+    "write": Quota(SHEETS_WRITES_PER_MIN),
+}
+
+STATS = Stats()
+
+
+def _status(e):
+
+    return getattr(getattr(e, "response", None), "status_code", None)
+
+
+def _retryable(e) -> bool:
+
+    if _status(e) in RETRY_STATUS:
+        return True
+
+    # 接続断・タイムアウト（requests / urllib3 / socket）
+    return isinstance(e, (ConnectionError, TimeoutError)) or type(e).__name__ in (
+        "ConnectionError", "Timeout", "ReadTimeout", "ConnectTimeout"
+    )
+
+
+def call(kind: str, fn, *args, **kwargs):
+
+    for attempt in range(SHEETS_MAX_RETRIES + 1):
+
+        STATS.add(
+            throttled=QUOTAS[kind].acquire(),
+            **{kind + "s": 1}
+        )
+
+        try:
+            return fn(*args, **kwargs)
+
+        except Exception as e:
+
+            if attempt >= SHEETS_MAX_RETRIES or not _retryable(e):
+                raise
+
+            wait = min(SHEETS_BACKOFF_MAX_SEC, 2 ** attempt) + random.random()
+
+            print(
+                f"[WARN] sheets {getattr(fn, '__name__', kind)} "
+                f"status={_status(e)} retry in {wait:.1f}s"
+            )
+
+            STATS.add(retries=1)
+
+            time.sleep(wait)
+
+
+def _cells(data) -> int:
+
+    return sum(
+        len(d["values"]) * max((len(r) for r in d["values"]), default=0)
+        for d in data
+    )
+
+
+RANGE = re.compile(r"^([A-Z]+)(\d+):([A-Z]+)(\d+)$")
+
+
+def _split_range(d, max_cells: int) -> list:
+
+    # 1レンジが大きすぎる時は行で分ける（"A2:G100001" など）
+    m = RANGE.match(d["range"])
+
+    values = d["values"]
+
+    width = max((len(r) for r in values), default=1) or 1
+
+    rows = max(1, max_cells // width)
+
+    if not m or len(values) <= rows:
+        return [d]
+
+    c1, r1, c2, _ = m.groups()
+
+    r1 = int(r1)
+
+    return [
+        {
+            "range": f"{c1}{r1 + i}:{c2}{r1 + i + len(values[i:i + rows]) - 1}",
+            "values": values[i:i + rows],
+        }
+        for i in range(0, len(values), rows)
+    ]
+
+
+# ===============================
+# ワークシートのラッパー
+# ===============================
+class QuotaWorksheet:
+
+    def __init__(self, ws):
+        self._ws = ws
+
+    def __getattr__(self, name):
+
+        attr = getattr(self._ws, name)
+
+        if name in READ_METHODS:
+            return lambda *a, **kw: call("read", attr, *a, **kw)
+
+        if name in WRITE_METHODS:
+            return lambda *a, **kw: call("write", attr, *a, **kw)
+
+        return attr
+
+    def batch_update(self, data, **kwargs):
+
+        # 大きすぎるリクエストは分割（1回あたり SHEETS_MAX_CELLS_PER_CALL セル）
+        chunks = []
+        chunk = []
+        size = 0
+
+        for d in (p for d in data for p in _split_range(d, SHEETS_MAX_CELLS_PER_CALL)):
+
+            n = _cells([d])
+
+            if chunk and size + n > SHEETS_MAX_CELLS_PER_CALL:
+
+                chunks.append(chunk)
+                chunk = []
+                size = 0
+
+            chunk.append(d)
+            size += n
+
+        if chunk:
+            chunks.append(chunk)
+
+        results = [
+            call("write", self._ws.batch_update, c, **kwargs)
+            for c in chunks
+        ]
+
+        STATS.add(cells=_cells(data))
+
+        return results
+
+
+def report() -> str:
+
+    return (
+        f"[INFO] sheets api: reads={STATS.reads} writes={STATS.writes} "
+        f"cells={STATS.cells} retries={STATS.retries} "
+        f"throttled={STATS.throttled:.1f}s"
+    )
+
+
+def default_client():
+
+    import gspread
+    from google.oauth2.service_account import Credentials
+
+    creds = Credentials.from_service_account_info(
+        json.loads(os.environ["GOOGLE_SERVICE_ACCOUNT_JSON"]),
+        scopes=SCOPES
+    )
+
+    return gspread.authorize(creds)
+
+
+_factory = default_client
+_client = None
+_spreadsheets = {}
+
+
+def set_client_factory(factory):
+
+    global _factory, _client
+
+    _factory = factory or default_client
+    _client = None
+
+    _spreadsheets.clear()
+
+
+def get_client():
+
+    global _client
+
+    if _client is None:
+        _client = _factory()
+
+    return _client
+
+
+def open_spreadsheet(url: str | None = None):
+
+    url = url or os.environ["SPREADSHEET_URL"]
+
+    if url not in _spreadsheets:
+        _spreadsheets[url] = call("read", get_client().open_by_url, url)
+
+    return _spreadsheets[url]
+
+
+def get_worksheet(gid: int, url: str | None = None):
+
+    ws = call("read", open_spreadsheet(url).get_worksheet_by_id, int(gid))
+
+    return QuotaWorksheet(ws)
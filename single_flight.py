@@ -0,0 +1,106 @@
+# =========================================================
+# 実行中の重複問い合わせをまとめる（single-flight + メモ）
+#  - 同じキーの処理が実行中なら、その結果を待って共有する
+#  - 一度終わったキーは実行中ずっとメモから返す
+#  - 件数（呼び出し / 実行 / 実行中共有 / メモ）を summary() で出力
+# =========================================================
+
+import asyncio
+
+
+class SingleFlight:
+
+    def __init__(self, name: str):
+
+        self.name = name
+
+        self._inflight = {}
+        self._done = {}
+
+        self.calls = 0
+        self.executed = 0
+        self.shared = 0
+        self.memo_hits = 0
+
+    def __contains__(self, key):
+        return key in self._done
+
+    # ===============================
+    # まとめて実行
+    #  - fn(keys) -> {key: result}（未実行のキーだけ渡される）
+    # ===============================
+    async def do_many(self, keys, fn) -> dict:
+
+        loop = asyncio.get_running_loop()
+
+        out = {}
+        waits = {}
+        new = []
+
+        for key in keys:
+
+            self.calls += 1
+
+            if key in self._done:
+
+                self.memo_hits += 1
+                out[key] = self._done[key]
+
+            elif key in self._inflight:
+
+                self.shared += 1
+                waits[key] = self._inflight[key]
+
+            elif key not in new:
+
+                new.append(key)
+                self._inflight[key] = loop.create_future()
+
+        if new:
+
+            self.executed += len(new)
+
+            try:
+
+                results = await fn(new)
+
+            except BaseException as e:
+
+                for key in new:
+
+                    fut = self._inflight.pop(key)
+                    fut.set_exception(e)
+
+                    # 待っている人がいなくても警告を出さない
+                    fut.exception()
+
+                raise
+
+            for key in new:
+
+                v = results.get(key)
+
+                self._done[key] = v
+                self._inflight.pop(key).set_result(v)
+
+                out[key] = v
+
+        for key, fut in waits.items():
+            out[key] = await asyncio.shield(fut)
+
+        return out
+
+    async def do(self, key, fn):
+
+        async def run_one(keys):
+            return {key: await fn()}
+
+        return (await self.do_many([key], run_one))[key]
+
+    def summary(self) -> str:
+
+        return (
+            f"[INFO] dedup {self.name}: calls={self.calls} "
+            f"executed={self.executed} shared={self.shared} "
+            f"memo={self.memo_hits}"
+        )
@@ -0,0 +1,245 @@
+# =========================================================
+# ローカルの価格ストア（SQLite）
+#  - 出力シートではなくこちらを正とする（シートは sheet_sync で反映する表示用）
+#    products: 商品（ID, site ごとの NAME）
+#    listings: 見つかった出品（site, item_id, size, price, ID, seen）
+#    prices:   (ID, size, site) ごとの最安値 = 出力シートの1行
+#  - prices は書き込むたびに version を上げ、シートに送った version（synced）
+#    と違う行だけを同期する
+#  - WAL + busy_timeout で複数のスクレイパー / プロセスから同時に書ける
+#  - まだ取り込んでいないサイト（初回・キャッシュ切れ）だけ出力シートから読む
+# =========================================================
+
+import os
+import sqlite3
+from datetime import datetime
+from contextlib import contextmanager
+
+from models import OutputRow
+
+
+STORE_PATH = os.environ.get("STORE_PATH", "cache/store/prices.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id TEXT NOT NULL,
+    site TEXT NOT NULL,
+    name TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (id, site)
+);
+
+CREATE TABLE IF NOT EXISTS listings (
+    site TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    size TEXT NOT NULL,
+    id TEXT NOT NULL,
+    price INTEGER NOT NULL,
+    seen TEXT NOT NULL,
+    PRIMARY KEY (site, item_id, size)
+);
+
+CREATE TABLE IF NOT EXISTS prices (
+    id TEXT NOT NULL,
+    size TEXT NOT NULL,
+    site TEXT NOT NULL,
+    price INTEGER NOT NULL DEFAULT 0,
+    url TEXT NOT NULL DEFAULT '',
+    updated TEXT NOT NULL DEFAULT '',
+    version INTEGER NOT NULL DEFAULT 1,
+    synced INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (id, site, size)
+);
+
+CREATE INDEX IF NOT EXISTS prices_unsynced
+    ON prices (site) WHERE version != synced;
+
+CREATE TABLE IF NOT EXISTS imports (
+    site TEXT PRIMARY KEY,
+    rows INTEGER NOT NULL,
+    imported TEXT NOT NULL
+);
+"""
+
+
+def _price(v) -> int:
+
+    try:
+        return int(float(str(v).replace(",", "").strip() or 0))
+    except ValueError:
+        return 0
+
+
+class Store:
+
+    def __init__(self, path: str = STORE_PATH):
+
+        self.path = path
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        # isolation_level=None: トランザクションは transaction() で明示
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+
+        self.conn.executescript(SCHEMA)
+
+    @contextmanager
+    def transaction(self):
+
+        # 書き込みロックを最初に取る（途中で他のプロセスとぶつからない）
+        self.conn.execute("BEGIN IMMEDIATE")
+
+        try:
+            yield self
+
+        except BaseException:
+
+            self.conn.execute("ROLLBACK")
+            raise
+
+        else:
+            self.conn.execute("COMMIT")
+
+    def close(self):
+
+        self.conn.close()
+
+    # ===============================
+    # 初回の取り込み（出力シート → prices）
+    #  - 取り込んだ行はシートと同じなので同期済みにする
+    # ===============================
+    def imported(self, site) -> bool:
+
+        return self.conn.execute(
+            "SELECT 1 FROM imports WHERE site = ?", (site,)
+        ).fetchone() is not None
+
+    def import_table(self, table, site) -> int:
+
+        rows = []
+        names = {}
+
+        for key, row_num in table.by_key.items():
+
+            pid, size, key_site = key
+
+            if key_site != site:
+                continue
+
+            row = table.rows[row_num] + [""] * 7
+
+            names[pid] = row[1]
+
+            rows.append((pid, size, site, _price(row[4]), row[5], row[6]))
+
+        with self.transaction():
+
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO products (id, site, name) VALUES (?, ?, ?)",
+                [(pid, site, name) for pid, name in names.items()]
+            )
+
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO prices (id, size, site, price, url, updated, synced)"
+                " VALUES (?, ?, ?, ?, ?, ?, 1)",
+                rows
+            )
+
+            self.conn.execute(
+                "INSERT OR REPLACE INTO imports (site, rows, imported) VALUES (?, ?, ?)",
+                (site, len(rows), datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+
+        print(f"[INFO] store imported {site}: rows={len(rows)}")
+
+        return len(rows)
+
+    # ===============================
+    # 参照
+    # ===============================
+    def sizes(self, pid, site) -> set:
+
+        return {
+            size for (size,) in self.conn.execute(
+                "SELECT size FROM prices WHERE id = ? AND site = ?",
+                (str(pid), site)
+            )
+        }
+
+    def count(self, site) -> int:
+
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM prices WHERE site = ?", (site,)
+        ).fetchone()[0]
+
+    # ===============================
+    # 更新（transaction() の中で呼ぶ）
+    # ===============================
+    def set_name(self, pid, site, name):
+
+        self.conn.execute(
+            "INSERT INTO products (id, site, name) VALUES (?, ?, ?)"
+            " ON CONFLICT (id, site) DO UPDATE SET name = excluded.name",
+            (str(pid), site, name)
+        )
+
+    def upsert(self, row: OutputRow):
+
+        self.set_name(row.pid, row.site, row.name)
+
+        self.conn.execute(
+            "INSERT INTO prices (id, size, site, price, url, updated)"
+            " VALUES (?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT (id, site, size) DO UPDATE SET"
+            " price = excluded.price, url = excluded.url,"
+            " updated = excluded.updated, version = version + 1",
+            (str(row.pid), row.size, row.site, int(row.price), row.url, row.updated)
+        )
+
+    def set_price(self, pid, size, site, price, updated):
+
+        # URL はそのまま（前回の最安の出品を残す）
+        self.conn.execute(
+            "UPDATE prices SET price = ?, updated = ?, version = version + 1"
+            " WHERE id = ? AND site = ? AND size = ?",
+            (int(price), updated, str(pid), site, size)
+        )
+
+    def add_listings(self, pid, candidates, seen: str):
+
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO listings (site, item_id, size, id, price, seen)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            [(c.site, c.item_id, c.size, str(pid), c.price, seen) for c in candidates]
+        )
+
+    # ===============================
+    # 同期用
+    #  - changed(): シートに未反映の行 [(version, OutputRow)]
+    #  - mark_synced(): 送った version を記録（送信中に更新された行は残る）
+    # ===============================
+    def changed(self, site) -> list:
+
+        return [
+            (version, OutputRow(pid, name or "", size, site, price, url, updated))
+            for pid, name, size, price, url, updated, version in self.conn.execute(
+                "SELECT p.id, n.name, p.size, p.price, p.url, p.updated, p.version"
+                " FROM prices p"
+                " LEFT JOIN products n ON n.id = p.id AND n.site = p.site"
+                " WHERE p.site = ? AND p.version != p.synced"
+                " ORDER BY p.rowid",
+                (site,)
+            )
+        ]
+
+    def mark_synced(self, site, sent):
+
+        with self.transaction():
+
+            self.conn.executemany(
+                "UPDATE prices SET synced = ?"
+                " WHERE id = ? AND site = ? AND size = ? AND version = ?",
+                [(version, row.pid, site, row.size, version) for version, row in sent]
+            )
@@ -0,0 +1,110 @@
+import os
+import sys
+import asyncio
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from circuit_breaker import CircuitBreaker, SiteDown, OPEN, CLOSED, HALF_OPEN
+
+
+def test_probe_result_only_from_token_holder():
+
+    async def run():
+
+        breaker = CircuitBreaker("test", min_calls=1, cooldown=0)
+
+        # trip 前に始まった商品ページ
+        before = await breaker.acquire()
+
+        failed = await breaker.acquire()
+        breaker.record(False, failed)
+
+        assert breaker.state == OPEN
+
+        probe = await breaker.acquire()
+
+        assert breaker.state == HALF_OPEN
+
+        # 以前は half-open 中に届いた結果を試行の結果として扱っていた
+        breaker.record(True, before)
+
+        assert breaker.state == HALF_OPEN
+
+        breaker.record(True, probe)
+
+        assert breaker.state == CLOSED
+
+        # 閉じた後も trip 前の token は数えない
+        breaker.record(False, before)
+
+        assert list(breaker.results) == []
+
+    asyncio.run(run())
+
+
+def test_trip_is_shared_across_workers(tmp_path):
+
+    async def run():
+
+        a = CircuitBreaker("test", min_calls=1, cooldown=60, state_dir=str(tmp_path))
+        b = CircuitBreaker("test", min_calls=1, cooldown=60, state_dir=str(tmp_path))
+
+        token = await a.acquire()
+        a.record(False, token)
+
+        # b は自分では失敗していないが、a の trip で止まる
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(b.acquire(), timeout=0.2)
+
+        assert b.state == OPEN
+        assert b.trips == 1
+
+    asyncio.run(run())
+
+
+def test_site_down_is_shared_across_workers(tmp_path):
+
+    async def run():
+
+        a = CircuitBreaker("test", min_calls=1, max_trips=1, state_dir=str(tmp_path))
+        b = CircuitBreaker("test", min_calls=1, max_trips=1, state_dir=str(tmp_path))
+
+        token = await a.acquire()
+        a.record(False, token)
+
+        with pytest.raises(SiteDown):
+            await b.acquire()
+
+    asyncio.run(run())
+
+
+def test_one_probe_across_workers(tmp_path):
+
+    async def run():
+
+        a = CircuitBreaker("test", min_calls=1, cooldown=0, state_dir=str(tmp_path))
+        b = CircuitBreaker("test", min_calls=1, cooldown=0, state_dir=str(tmp_path))
+
+        token = await a.acquire()
+        a.record(False, token)
+
+        probe = await a.acquire()
+
+        # a が試行中は b は通さない
+        waiting = asyncio.ensure_future(b.acquire())
+
+        await asyncio.sleep(0.2)
+
+        assert not waiting.done()
+
+        a.record(True, probe)
+
+        await asyncio.wait_for(waiting, timeout=5)
+
+        assert a.state == CLOSED
+        assert b.state == CLOSED
+        assert b.total_trips == 1
+
+    asyncio.run(run())
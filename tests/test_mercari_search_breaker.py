@@ -0,0 +1,164 @@
+import os
+import sys
+import time
+import asyncio
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from circuit_breaker import CircuitBreaker, OPEN, CLOSED
+from negative_cache import NegativeCache
+from single_flight import SingleFlight
+import mercari_scraper
+
+
+class FakeMouse:
+
+    async def wheel(self, x, y):
+        pass
+
+
+class FakePage:
+
+    def __init__(self):
+
+        self.mouse = FakeMouse()
+        self.gotos = 0
+
+    def on(self, event, fn):
+        pass
+
+    def remove_listener(self, event, fn):
+        pass
+
+    async def goto(self, url, **kwargs):
+        self.gotos += 1
+
+    async def wait_for_timeout(self, ms):
+        pass
+
+
+class FailingSearchClient:
+
+    def __init__(self, enabled=True, site_down=True):
+
+        self.enabled = enabled
+        self.site_down = site_down
+        self.calls = 0
+
+    async def search(self, keyword):
+
+        self.calls += 1
+
+        return None
+
+
+def half_open_breaker():
+
+    breaker = CircuitBreaker("test", cooldown=0)
+
+    # 待ち明け済みの open（次の acquire が half-open の試行になる）
+    breaker._commit(breaker._trip)
+
+    return breaker
+
+
+def fetch(breaker, client, page):
+
+    return mercari_scraper.fetch_size_candidates(
+        page,
+        "dunk",
+        [],
+        None,
+        SingleFlight("items"),
+        NegativeCache(os.path.join(tempfile.mkdtemp(), "negative.json")),
+        breaker,
+        client
+    )
+
+
+def test_half_open_api_failure_falls_back_to_search_page():
+
+    async def run():
+
+        breaker = half_open_breaker()
+        client = FailingSearchClient()
+        page = FakePage()
+
+        # 以前は scroll() の2回目の acquire() で止まったまま戻らなかった
+        await asyncio.wait_for(fetch(breaker, client, page), timeout=5)
+
+        return breaker, client, page
+
+    breaker, client, page = asyncio.run(run())
+
+    assert client.calls == 1
+    assert page.gotos == 1
+
+    # API の失敗で trip → 待ち明けの試行（検索ページ）が成功して closed
+    assert breaker.state == CLOSED
+    assert breaker._probe is None
+
+
+def test_half_open_with_api_disabled_probes_once():
+
+    async def run():
+
+        breaker = half_open_breaker()
+        client = FailingSearchClient(enabled=False)
+        page = FakePage()
+
+        await asyncio.wait_for(fetch(breaker, client, page), timeout=5)
+
+        return breaker, client, page
+
+    breaker, client, page = asyncio.run(run())
+
+    assert client.calls == 0
+    assert page.gotos == 1
+    assert breaker.state == CLOSED
+
+
+def test_client_side_api_failure_does_not_count_against_site():
+
+    async def run():
+
+        breaker = CircuitBreaker("test", cooldown=0)
+
+        # 4xx（署名・リクエスト不正）は site_down=False
+        client = FailingSearchClient(site_down=False)
+        page = FakePage()
+
+        for _ in range(5):
+            await asyncio.wait_for(fetch(breaker, client, page), timeout=5)
+
+        return breaker, client, page
+
+    breaker, client, page = asyncio.run(run())
+
+    # 以前は F,T,F,T,F と記録されて open になっていた
+    assert client.calls == 5
+    assert page.gotos == 5
+    assert breaker.state == CLOSED
+    assert breaker.total_trips == 0
+    assert list(breaker.results) == [True] * 5
+
+
+def test_half_open_client_side_api_failure_releases_probe():
+
+    async def run():
+
+        breaker = half_open_breaker()
+        client = FailingSearchClient(site_down=False)
+        page = FakePage()
+
+        await asyncio.wait_for(fetch(breaker, client, page), timeout=5)
+
+        return breaker, page
+
+    breaker, page = asyncio.run(run())
+
+    # 試行枠は検索ページに渡り、trip は増えない（helper の1回だけ）
+    assert page.gotos == 1
+    assert breaker.state == CLOSED
+    assert breaker.total_trips == 1
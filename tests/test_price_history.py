@@ -0,0 +1,65 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from price_history import PriceHistory
+
+
+def test_append_after_torn_write_keeps_rows_aligned(tmp_path):
+
+    history = PriceHistory(str(tmp_path))
+
+    history.append([
+        (1000, "A", "27.0", "メルカリ", 100, "i1"),
+        (2000, "B", "27.0", "メルカリ", 300, "i2"),
+    ])
+
+    # 2行目の途中で落ちた状態（ts / id だけ3行目が書けている）
+    with open(tmp_path / "ts.bin", "ab") as f:
+        f.write((3000).to_bytes(8, sys.byteorder))
+
+    with open(tmp_path / "id.bin", "ab") as f:
+        f.write((1).to_bytes(4, sys.byteorder))
+
+    with open(tmp_path / "item.dict", "ab") as f:
+        f.write("i3-torn".encode("utf-8"))
+
+    history = PriceHistory(str(tmp_path))
+
+    assert len(history) == 2
+
+    history.append([(4000, "A", "27.0", "メルカリ", 200, "i4")])
+
+    history = PriceHistory(str(tmp_path))
+
+    # 以前は (2000, 'A', ..., 300, 'i3') のようにずれて読めた
+    assert list(history.scan()) == [
+        (1000, "A", "27.0", "メルカリ", 100, "i1"),
+        (2000, "B", "27.0", "メルカリ", 300, "i2"),
+        (4000, "A", "27.0", "メルカリ", 200, "i4"),
+    ]
+
+
+def test_query_filters_before_reading_other_columns(tmp_path):
+
+    history = PriceHistory(str(tmp_path))
+
+    history.append([
+        (86400 * 1 + 10, "A", "27.0", "メルカリ", 300, "i1"),
+        (86400 * 1 + 20, "A", "27.0", "メルカリ", 100, "i2"),
+        (86400 * 1 + 30, "A", "28.0", "Yahoo!フリマ", 500, "i3"),
+        (86400 * 1 + 40, "B", "27.0", "メルカリ", 50, "i4"),
+        (86400 * 2 + 10, "A", "27.0", "メルカリ", 0, "i5"),
+    ])
+
+    history = PriceHistory(str(tmp_path))
+
+    rows = history.query("A", site="メルカリ", since=0, window="1d")
+
+    assert [(r["size"], r["min"], r["count"]) for r in rows] == [("27.0", 100, 2)]
+
+    # ID / item_id の列は読んでいない
+    assert set(history._columns) == {"ts", "id", "size", "site", "price"}
+
+    assert history.query("missing") == []
@@ -0,0 +1,158 @@
+import os
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import OutputRow
+from store import Store
+from sheet_sync import sync
+from sheet_table import SheetTable
+from mercari_common import HEADER
+from scale_harness import FakeWorksheet
+
+
+SITE = "メルカリ"
+
+
+class SheetWorksheet(FakeWorksheet):
+
+    # 書き込みをシートの値に反映する（fail=True なら送信失敗）
+    def __init__(self, values):
+
+        super().__init__(values)
+
+        self.fail = False
+        self.opened = 0
+
+    def batch_update(self, data, value_input_option="RAW"):
+
+        if self.fail:
+            raise Exception("sheets 503")
+
+        super().batch_update(data, value_input_option)
+
+        for d in data:
+
+            start, row, _, _ = re.match(r"([A-Z]+)(\d+):([A-Z]+)(\d+)", d["range"]).groups()
+
+            col = ord(start) - ord("A")
+
+            for i, values in enumerate(d["values"]):
+
+                r = int(row) - 1 + i
+
+                while len(self.values) <= r:
+                    self.values.append([])
+
+                line = self.values[r]
+                line += [""] * (col + len(values) - len(line))
+                line[col:col + len(values)] = values
+
+    def table(self):
+
+        self.opened += 1
+
+        return SheetTable(self, HEADER)
+
+    def prices(self) -> dict:
+
+        return {(r[0], r[2]): r[4] for r in self.values[1:]}
+
+
+@pytest.fixture
+def env(tmp_path):
+
+    path = str(tmp_path / "prices.db")
+
+    ws = SheetWorksheet([
+        HEADER,
+        ["P1", "Dunk", "27.0", SITE, "10000", "https://a", "2026-01-01 00:00"],
+        ["P1", "Dunk", "28.0", SITE, "12000", "https://b", "2026-01-01 00:00"],
+    ])
+
+    store = Store(path)
+
+    store.import_table(ws.table(), SITE)
+
+    yield store, ws, path
+
+    store.close()
+
+
+def row(size, price, pid="P1"):
+
+    return OutputRow(pid, "Dunk", size, SITE, price, "https://x", "2026-01-02 00:00")
+
+
+def test_first_import_is_not_sent_back(env):
+
+    store, ws, path = env
+
+    assert store.changed(SITE) == []
+
+    # 変更が無ければシートを開かない
+    assert sync(SITE, ws.table, path) == 0
+    assert ws.opened == 1
+
+
+def test_changed_rows_are_sent_once(env):
+
+    store, ws, path = env
+
+    store.upsert(row("27.0", 9000))
+    store.upsert(row("29.0", 15000))
+
+    assert sync(SITE, ws.table, path) > 0
+
+    assert ws.prices() == {("P1", "27.0"): 9000, ("P1", "28.0"): "12000", ("P1", "29.0"): 15000}
+
+    assert store.changed(SITE) == []
+    assert sync(SITE, ws.table, path) == 0
+
+
+def test_failed_flush_is_resent(env):
+
+    store, ws, path = env
+
+    store.upsert(row("27.0", 9000))
+
+    ws.fail = True
+
+    with pytest.raises(Exception):
+        sync(SITE, ws.table, path)
+
+    # 送れなかった行は同期済みにならない
+    assert [r.price for _, r in store.changed(SITE)] == [9000]
+
+    ws.fail = False
+
+    assert sync(SITE, ws.table, path) > 0
+    assert ws.prices()[("P1", "27.0")] == 9000
+    assert store.changed(SITE) == []
+
+
+def test_row_updated_during_sync_stays_pending(env):
+
+    store, ws, path = env
+
+    store.upsert(row("27.0", 9000))
+
+    def open_table():
+
+        # 送る行を読んだ後、flush の前にスクレイパーが同じ行を更新
+        store.upsert(row("27.0", 8000))
+
+        return ws.table()
+
+    assert sync(SITE, open_table, path) > 0
+
+    # シートには古い値が届いたが、新しい version は未同期のまま残る
+    assert ws.prices()[("P1", "27.0")] == 9000
+    assert [r.price for _, r in store.changed(SITE)] == [8000]
+
+    assert sync(SITE, ws.table, path) > 0
+    assert ws.prices()[("P1", "27.0")] == 8000
+    assert store.changed(SITE) == []
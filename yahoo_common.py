@@ -0,0 +1,124 @@
+# ==================================================
+# Yahoo!フリマ 共通処理（ブラウザ / Sheets に依存しない部分）
+#  - サイズ抽出・正規化、検索結果からの候補抽出、URL 生成
+#  - ワーカープロセスやベンチマークから単体で import できる
+# ==================================================
+import re
+
+from bs4 import BeautifulSoup
+
+from models import Listing
+
+UA = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0.0.0 Safari/537.36"
+)
+
+SIZE_PATTERN = re.compile(r"\b(2[3-9](?:\.5)?|3[0-2](?:\.5)?)cm\b")
+
+# 構造化フィールドの値（"27.5" / "27.5cm" / 27.5）
+SIZE_VALUE = re.compile(r"(2[3-9](?:\.5)?|3[0-2](?:\.5)?)(?:\.0)?\s*(?:cm)?")
+
+# サイズが無い時に本文として見るフィールド
+TEXT_KEYS = ("title", "name", "description")
+
+HEADERS = ["ID", "NAME", "size", "site", "price", "url", "updated_at"]
+SITE_CODE = "Yahoo!フリマ"
+
+# ==================================================
+# Utility
+# ==================================================
+def normalize_size(size_with_cm: str):
+    return size_with_cm.replace("cm", "").strip()
+
+def sizes_from_text(text: str) -> list:
+
+    matches = SIZE_PATTERN.findall(text)
+
+    return sorted(set(m + "cm" for m in matches))
+
+# 商品ページの HTML から（parse_pool のワーカーで実行）
+#  - 戻り値: (サイズのリスト, 本文の文字数)。文字数はブロック判定用
+def sizes_from_html(html) -> tuple:
+
+    if isinstance(html, bytes):
+        html = html.decode("utf-8", "replace")
+
+    text = BeautifulSoup(html, "html.parser").get_text(" ", strip=True)
+
+    return sizes_from_text(text), len(text)
+
+# ==================================================
+# 商品詳細 JSON からサイズ抽出
+#  - サイズ系のキー（size を含む）を優先し、無ければタイトル・説明文
+# ==================================================
+def _leaves(data, key=""):
+
+    if isinstance(data, dict):
+
+        for k, v in data.items():
+            yield from _leaves(v, str(k))
+
+    elif isinstance(data, list):
+
+        for v in data:
+            yield from _leaves(v, key)
+
+    elif isinstance(data, (str, int, float)) and not isinstance(data, bool):
+
+        yield key, str(data)
+
+def sizes_from_item(data: dict) -> list:
+
+    leaves = list(_leaves(data))
+
+    structured = set()
+
+    for key, value in leaves:
+
+        k = key.lower()
+
+        if "size" not in k or k.endswith("id"):
+            continue
+
+        m = SIZE_VALUE.fullmatch(value.strip())
+
+        if m:
+            structured.add(m.group(1) + "cm")
+
+    if structured:
+        return sorted(structured)
+
+    text = " ".join(v for k, v in leaves if k in TEXT_KEYS)
+
+    return sizes_from_text(text)
+
+def item_url(item_id: str) -> str:
+    return f"https://paypayfleamarket.yahoo.co.jp/item/{item_id}"
+
+# ==================================================
+# 検索結果から候補抽出（販売中・新品のみ）
+# ==================================================
+def extract_item_candidates(items) -> list[Listing]:
+
+    out = []
+
+    for item in items:
+
+        if item.get("itemStatus") != "OPEN":
+            continue
+
+        if item.get("condition") != "new":
+            continue
+
+        item_id = item.get("id")
+
+        price = item.get("price")
+
+        if not item_id or price is None:
+            continue
+
+        out.append(Listing(item_id, int(price)))
+
+    return out
@@ -0,0 +1,74 @@
+# =========================================================
+# Yahoo!フリマ 商品 API でのサイズ取得
+#  - 商品ページを開かず、商品詳細の JSON だけ取得（検索 API と同じドメイン）
+#  - 共有 HTTP クライアント（接続プール）を使う
+#  - サイズは構造化フィールド優先、無ければタイトル・説明文から
+# =========================================================
+
+import os
+import asyncio
+
+from api_switch import ApiSwitch
+from http_client import get_session
+from yahoo_common import sizes_from_item
+
+
+ITEM_API = os.environ.get(
+    "YAHOO_ITEM_API_URL",
+    "https://paypayfleamarket.yahoo.co.jp/api/item/v2/items/{item_id}"
+)
+
+API_HEADERS = {
+    "Accept": "application/json",
+    "Referer": "https://paypayfleamarket.yahoo.co.jp/",
+}
+
+
+class YahooItemResolver:
+
+    def __init__(self):
+
+        self.api = ApiSwitch("item api", "YAHOO_ITEM_API", "item pages")
+
+    @property
+    def enabled(self) -> bool:
+        return self.api.enabled
+
+    def _fetch(self, item_id):
+
+        r = get_session().get(
+            ITEM_API.format(item_id=item_id),
+            headers=API_HEADERS,
+            timeout=20
+        )
+
+        if r.status_code != 200:
+            raise Exception(f"status {r.status_code}")
+
+        return r.json()
+
+    # ===============================
+    # 取得
+    #  - 戻り値: サイズのリスト（サイズが無ければ []）
+    #  - 取得できなかった時は None（呼び出し側でページ表示にフォールバック）
+    # ===============================
+    async def resolve(self, item_id):
+
+        if not self.enabled:
+            return None
+
+        try:
+
+            data = await asyncio.to_thread(self._fetch, item_id)
+
+        except Exception as e:
+
+            print(f"[WARN] item api failed: {item_id} {e}")
+
+            self.api.failed()
+
+            return None
+
+        self.api.ok()
+
+        return sizes_from_item(data)
@@ -1,56 +1,51 @@
-import asyncio
-import json
-import re
-import requests
 import os
+import asyncio
 from datetime import datetime
+from functools import partial
 
 from playwright.async_api import async_playwright
-from bs4 import BeautifulSoup
 
-import gspread
-from google.oauth2.service_account import Credentials
+from yahoo_common import (
+    UA,
+    HEADERS,
+    SITE_CODE,
+    normalize_size,
+    sizes_from_html,
+    item_url,
+    extract_item_candidates,
+)
+from http_client import get_session
+from yahoo_item_api import YahooItemResolver
+from sheets import get_worksheet, report as sheets_report
+from price_history import PriceHistory
+from models import Candidate, OutputRow
+from store import Store
+from sheet_sync import sync, SHEET_SYNC
+from aggregate import CandidateFrame, build_output
+from sheet_table import SheetTable
+from sharding import run_sharded, auto_worker_count
+from sheet_io import SheetIO
+from profiling import profiled, tracer
+from parse_pool import parse_pool
+from browser_state import BrowserState
+from browser_profiles import launch_browser
+from single_flight import SingleFlight
+from negative_cache import NegativeCache
+from circuit_breaker import CircuitBreaker, SiteDown
 
 # ==================================================
 # 定数
 # ==================================================
 SEARCH_API = "https://paypayfleamarket.yahoo.co.jp/api/v1/search"
 
-UA = (
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-    "AppleWebKit/537.36 (KHTML, like Gecko) "
-    "Chrome/120.0.0.0 Safari/537.36"
-)
-
-SIZE_PATTERN = re.compile(r"\b(2[3-9](?:\.5)?|3[0-2](?:\.5)?)cm\b")
-
 INPUT_SHEET_GID = 0
 OUTPUT_SHEET_GID = 1994370799
 
-HEADERS = ["ID", "NAME", "size", "site", "price", "url", "updated_at"]
-SITE_CODE = "Yahoo!フリマ"
-
+# キーワード間の待ち（サイト全体で 90 秒に1キーワード）
 KEYWORD_SLEEP_SEC = 90
 
-# ==================================================
-# Google Sheets 認証
-# ==================================================
-creds_dict = json.loads(os.environ["GOOGLE_SERVICE_ACCOUNT_JSON"])
-
-creds = Credentials.from_service_account_info(
-    creds_dict,
-    scopes=["https://www.googleapis.com/auth/spreadsheets"],
-)
-
-gc = gspread.authorize(creds)
-
-SPREADSHEET_URL = os.environ["SPREADSHEET_URL"]
-
-# ==================================================
-# Utility
-# ==================================================
-def normalize_size(size_with_cm: str):
-    return size_with_cm.replace("cm", "").strip()
+# 既定は1プロセス。分ける時は各プロセスの待ちを workers 倍にする
+YAHOO_WORKERS = os.environ.get("YAHOO_WORKERS", "1")
 
 # ==================================================
 # search API
@@ -71,7 +66,7 @@ def search_items(keyword, limit=80):
         "Referer": "https://paypayfleamarket.yahoo.co.jp/",
     }
 
-    r = requests.get(
+    r = get_session().get(
         SEARCH_API,
         params=params,
         headers=headers,
@@ -83,11 +78,12 @@ def search_items(keyword, limit=80):
     return r.json().get("items", []) or []
 
 # ==================================================
-# extract size
+# extract size（商品ページ / API が使えない時のフォールバック）
+#  - 開けなかった時は None（サイズが無い時の [] と区別する）
 # ==================================================
 async def extract_sizes(page, item_id):
 
-    url = f"https://paypayfleamarket.yahoo.co.jp/item/{item_id}"
+    url = item_url(item_id)
 
     for attempt in (1, 2):
 
@@ -101,16 +97,14 @@ async def extract_sizes(page, item_id):
 
             html = await page.content()
 
-            soup = BeautifulSoup(html, "html.parser")
+            # パースはイベントループの外で
+            sizes, text_len = await parse_pool().run(sizes_from_html, html)
 
-            text = soup.get_text(" ", strip=True)
-
-            if len(text) < 500:
+            # サイズが読めた時は本文が短くてもブロック扱いしない
+            if not sizes and text_len < 500:
                 raise Exception("blocked")
 
-            matches = SIZE_PATTERN.findall(text)
-
-            return sorted(set(m + "cm" for m in matches))
+            return sizes
 
         except:
 
@@ -124,7 +118,7 @@ async def extract_sizes(page, item_id):
 
                 print(f"[WARN] blocked: {item_id}")
 
-                return []
+                return None
 
         finally:
 
@@ -135,223 +129,330 @@ async def extract_sizes(page, item_id):
 # ==================================================
 def load_input_products():
 
-    ws = gc.open_by_url(
-        SPREADSHEET_URL
-    ).get_worksheet_by_id(INPUT_SHEET_GID)
+    ws = get_worksheet(INPUT_SHEET_GID)
 
     rows = ws.get_all_records()
 
-    return {
-        row["NAME"]: row["ID"]
+    # 同じ NAME の行も全部返す（検索は scrape_keywords 側で1回にまとまる）
+    return [
+        (row["NAME"], str(row["ID"]).strip())
         for row in rows
         if row.get("ID") and row.get("NAME")
-    }
+    ]
 
 def prepare_output_sheet():
 
-    ws = gc.open_by_url(
-        SPREADSHEET_URL
-    ).get_worksheet_by_id(OUTPUT_SHEET_GID)
+    ws = get_worksheet(OUTPUT_SHEET_GID)
 
-    all_values = ws.get_all_values()
+    return SheetTable(
+        ws,
+        HEADERS,
+        normalize={2: normalize_size},
+        value_input_option="USER_ENTERED",
+    )
 
-    if not all_values:
+# ==================================================
+# scrape（1プロセス分）
+# ==================================================
+async def scrape_keyword(
+    keyword,
+    item_sizes: SingleFlight,
+    negative: NegativeCache,
+    resolver: YahooItemResolver,
+    breaker: CircuitBreaker,
+    state: BrowserState
+) -> list:
 
-        ws.append_row(HEADERS)
+    candidates = []
 
-        existing = []
+    # 検索 / 商品ページの成否を breaker に記録（止まっている間は待つ）
+    token = await breaker.acquire()
 
-        last_row = 1
+    try:
+        items = await asyncio.to_thread(search_items, keyword)
+    except Exception:
+        breaker.record(False, token)
+        raise
 
-    elif len(all_values) == 1:
+    breaker.record(True, token)
 
-        existing = []
+    # Playwright（Node のドライバ）もブラウザも、商品ページが要る時に初めて起動
+    p = None
 
-        last_row = 1
+    browser = None
 
-    else:
+    page = None
 
-        existing = ws.get_all_records()
+    # API → 取れなかった時だけブラウザを起動して商品ページ
+    async def resolve_sizes(item_id):
 
-        last_row = len(all_values)
+        nonlocal p, browser, page
 
-    row_map = {}
+        sizes = await resolver.resolve(item_id)
 
-    existing_sizes_map = {}
+        if sizes is not None:
 
-    for idx, r in enumerate(existing, start=2):
+            if sizes == []:
+                negative.add(SITE_CODE, item_id, "api_no_size")
 
-        pid = str(r.get("ID", "")).strip()
+            return sizes
 
-        size = normalize_size(
-            str(r.get("size", "")).strip()
-        )
+        if page is None:
 
-        site = str(r.get("site", "")).strip()
+            p = await async_playwright().start()
 
-        if not pid or not size or not site:
-            continue
+            browser = await launch_browser(p, "yahoo")
 
-        row_map[(pid, size, site)] = idx
+            # 前のキーワード / 前回の実行の Cookie を引き継ぐ
+            context = await browser.new_context(**state.context_options())
 
-        existing_sizes_map.setdefault(
-            (pid, site),
-            set()
-        ).add(size)
+            page = await context.new_page()
 
-    return ws, row_map, existing_sizes_map, last_row
+            await tracer().start(context)
 
-# ==================================================
-# main
-# ==================================================
-async def run():
+        token = await breaker.acquire()
+
+        try:
+            sizes = await tracer().traced(
+                page,
+                item_id,
+                lambda: extract_sizes(page, item_id)
+            )
+        except BaseException:
+            breaker.release(token)
+            raise
+
+        breaker.record(sizes is not None, token)
+
+        if sizes == []:
+            negative.add(SITE_CODE, item_id, "no_size_pattern")
+
+        return sizes
+
+    try:
+
+        for x in extract_item_candidates(items):
+
+            item_id = x.item_id
+
+            # サイズが決まらないと分かっている商品は開かない
+            if negative.check(SITE_CODE, item_id):
+                continue
 
-    id_name_map = load_input_products()
+            # 他のキーワードで取得済みの商品は開かない
+            sizes = await item_sizes.do(
+                (SITE_CODE, item_id),
+                lambda: resolve_sizes(item_id)
+            )
+
+            for s in sizes or []:
+
+                candidates.append(
+                    Candidate(SITE_CODE, item_id, x.price, normalize_size(s))
+                )
+
+        if browser:
+
+            await state.save(page.context)
+
+            await browser.close()
+
+    finally:
+
+        # 例外の時もドライバを止める（ブラウザも一緒に終了する）
+        if p:
+            await p.stop()
 
-    output_ws, row_map, existing_sizes_map, last_row = prepare_output_sheet()
+    return candidates
 
-    # ★追加（最小修正）
-    all_batch_updates = []
+async def scrape_keywords(pairs: list, workers: int = 1) -> list:
 
-    for keyword, product_id_raw in id_name_map.items():
+    results = []
 
-        product_id = str(product_id_raw).strip()
+    # 並行しているプロセス数だけ間隔を空ける（サイトから見た頻度は1プロセスと同じ）
+    sleep_sec = KEYWORD_SLEEP_SEC * workers
+
+    # 実行単位の重複排除（商品 / 同じキーワードの検索）
+    item_sizes = SingleFlight("items")
+
+    searches = SingleFlight("searches")
+
+    negative = NegativeCache()
+
+    resolver = YahooItemResolver()
+
+    breaker = CircuitBreaker(SITE_CODE)
+
+    state = BrowserState("yahoo")
+
+    for keyword, product_id in pairs:
 
         print(f"\n=== KEYWORD: {keyword} ===")
 
-        async with async_playwright() as p:
+        fresh = keyword not in searches
+
+        try:
 
-            browser = await p.chromium.launch(
-                headless=True,
-                args=["--no-sandbox", "--disable-dev-shm-usage"],
+            candidates = await searches.do(
+                keyword,
+                lambda: scrape_keyword(
+                    keyword,
+                    item_sizes,
+                    negative,
+                    resolver,
+                    breaker,
+                    state
+                )
             )
 
-            page = await browser.new_page()
+        except SiteDown:
 
-            items = search_items(keyword)
+            # ブロックされたままの Cookie は次回に持ち越さない
+            state.invalidate("(site down)")
 
-            size_min_map = {}
+            # 終わったキーワードだけ返して書き込ませる
+            print(f"[WARN] {SITE_CODE} down, stop at {keyword} ({len(results)}/{len(pairs)} done)")
+            break
 
-            for item in items:
+        except Exception as e:
 
-                if item.get("itemStatus") != "OPEN":
-                    continue
+            # 検索できなかったキーワードは書き込まない（price=0 にしない）
+            print(f"[WARN] search failed: {keyword} {e}")
+            candidates = None
 
-                if item.get("condition") != "new":
-                    continue
+        if candidates is not None:
+            results.append((product_id, keyword, candidates))
 
-                item_id = item.get("id")
+        if fresh:
 
-                price = item.get("price")
+            print(f"[INFO] sleep {sleep_sec}s")
 
-                if not item_id or price is None:
-                    continue
+            await asyncio.sleep(sleep_sec)
 
-                sizes = await extract_sizes(page, item_id)
+    print(item_sizes.summary())
+    print(searches.summary())
+    print(negative.report())
+    print(breaker.summary())
 
-                if not sizes:
-                    continue
+    parse_pool().shutdown()
 
-                for s in sizes:
+    negative.save()
 
-                    size = normalize_size(s)
+    return results
 
-                    if (
-                        size not in size_min_map
-                        or price < size_min_map[size]["price"]
-                    ):
+# ==================================================
+# main
+# ==================================================
+async def run():
 
-                        size_min_map[size] = {
+    io = SheetIO()
 
-                            "price": int(price),
+    store = Store()
 
-                            "url": f"https://paypayfleamarket.yahoo.co.jp/item/{item_id}",
-                        }
+    # 出力シートは store に取り込んでいない時だけ読む（スクレイピングと並行）
+    input_future = io.read(load_input_products)
 
-            await browser.close()
+    table_future = None if store.imported(SITE_CODE) else io.read(prepare_output_sheet)
 
-        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    pairs = await input_future
 
-        existing_sizes = existing_sizes_map.get(
-            (product_id, SITE_CODE),
-            set()
-        )
+    frame = CandidateFrame()
 
-        target_sizes = set(existing_sizes) | set(size_min_map.keys())
+    names = {}
 
-        batch_updates = []
+    observations = []
 
-        for size in sorted(target_sizes, key=lambda x: float(x)):
+    # ==================================================
+    # 集計（ID,size単位で最安 / 取得できなかったサイズは price=0）
+    #  - シャードが終わるたびに store へ反映（シートへは最後に同期）
+    # ==================================================
+    async def apply_results(results):
 
-            if size in size_min_map:
+        nonlocal table_future
 
-                price = size_min_map[size]["price"]
+        if table_future is not None:
 
-                url = size_min_map[size]["url"]
+            store.import_table(await table_future, SITE_CODE)
 
-            else:
+            table_future = None
 
-                price = 0
+        observed = datetime.now()
 
-                url = ""
+        now = observed.strftime("%Y-%m-%d %H:%M:%S")
 
-            values = [
-                product_id,
-                keyword,
-                size,
-                SITE_CODE,
-                price,
-                url,
-                now,
-            ]
+        shard_ids = []
 
-            key = (product_id, size, SITE_CODE)
+        with store.transaction():
 
-            if key in row_map:
+            for product_id, keyword, candidates in results:
 
-                row = row_map[key]
+                names[product_id] = keyword
 
-            else:
+                shard_ids.append(product_id)
+
+                frame.extend(product_id, candidates)
+
+                store.add_listings(product_id, candidates, now)
+
+            for product_id, size, v in build_output(
+                frame.cheapest(),
+                store.sizes,
+                shard_ids,
+                SITE_CODE,
+            ):
 
-                last_row += 1
+                if v is None:
 
-                row = last_row
+                    row = OutputRow(
+                        product_id, names[product_id], size, SITE_CODE, 0, "", now
+                    )
 
-                row_map[key] = row
+                else:
 
-                existing_sizes_map.setdefault(
-                    (product_id, SITE_CODE),
-                    set()
-                ).add(size)
+                    row = OutputRow.from_candidate(
+                        product_id, names[product_id], v, now
+                    )
 
-            batch_updates.append({
+                    observations.append(
+                        (observed, product_id, size, SITE_CODE, v.price, v.item_id)
+                    )
 
-                "range": f"A{row}:G{row}",
+                store.upsert(row)
+
+                print(f"更新 {product_id} size={size} price={row.price}")
+
+    # 取得（YAHOO_WORKERS 個のプロセスに分割、既定は1）
+    workers = auto_worker_count(len(pairs), YAHOO_WORKERS)
+
+    await run_sharded(
+        partial(scrape_keywords, workers=workers),
+        pairs,
+        workers,
+        apply_results
+    )
 
-                "values": [values]
+    # 価格履歴へ追記（store と同じく同期の前に。シートの失敗で履歴を失わない）
+    appended = PriceHistory().append(observations)
 
-            })
+    print(f"[INFO] history appended={appended}")
 
-            print(f"更新 size={size} price={price}")
+    # シートへ同期（変更のあった行だけ）
+    if SHEET_SYNC:
+        io.write(sync, SITE_CODE, prepare_output_sheet, store.path)
 
-        # ★変更（最小修正）
-        all_batch_updates.extend(batch_updates)
+    cells = sum(await io.drain())
 
-        print(f"[INFO] sleep {KEYWORD_SLEEP_SEC}s")
+    io.close()
 
-        await asyncio.sleep(KEYWORD_SLEEP_SEC)
+    store.close()
 
-    # ★追加（最小修正）
-    if all_batch_updates:
+    print(f"[INFO] cells written={cells}")
 
-        output_ws.batch_update(
-            all_batch_updates,
-            value_input_option="USER_ENTERED"
-        )
+    print(sheets_report())
 
 # ==================================================
 # start
 # ==================================================
 if __name__ == "__main__":
 
-    asyncio.run(run())
+    asyncio.run(profiled("yahoo_main", run()))